@@ -0,0 +1,112 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# Default budget for everything cached in one app process, shared by all sessions
+DEFAULT_CACHE_MB = 512
+CACHE_MB_ENV = 'HAR_ANALYZER_CACHE_MB'
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+def content_hash(source):
+    """SHA-256 of a HAR file's bytes, read in chunks from a path or file object."""
+    digest = hashlib.sha256()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            for chunk in iter(lambda: file.read(_HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    if hasattr(source, 'getbuffer'):
+        # In-memory uploads can be hashed without copying
+        digest.update(source.getbuffer())
+        return digest.hexdigest()
+
+    source.seek(0)
+    # Text streams end with '' rather than b'', so stop on any empty chunk
+    while chunk := source.read(_HASH_CHUNK_SIZE):
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def estimate_nbytes(value):
+    """Approximate in-memory size of a cached value."""
+    # pandas is not imported here; if it was never loaded, the value cannot be a pandas object
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if pd is not None and isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(item) for item in value)
+    # Reports such as build_timeline / build_network_report / analyze_payloads are dicts of frames
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(key) + estimate_nbytes(item)
+                                          for key, item in value.items())
+    return sys.getsizeof(value)
+
+
+class ByteLRUCache:
+    """
+    Thread-safe LRU cache bounded by the total estimated size of its values
+    rather than by entry count. Values larger than the whole budget are
+    returned to the caller but never stored.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value, nbytes=None):
+        if nbytes is None:
+            nbytes = estimate_nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return value
+            self._entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for `key`, computing and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            # Computed outside the lock so one slow parse doesn't block other sessions
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+def cache_budget_bytes():
+    return int(float(os.environ.get(CACHE_MB_ENV, DEFAULT_CACHE_MB)) * 1024 * 1024)
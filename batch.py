@@ -0,0 +1,275 @@
+"""
+Headless batch triage: analyze a directory (or glob) of HAR files in parallel.
+
+    python batch.py captures/ --workers 8 --output findings.jsonl
+    python batch.py "queue/**/*.har" --format parquet --output findings.parquet
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from har_parser import load_request_table
+from rule_engine import analyze_table, compile_rules, default_plan, load_rules
+from stats import StatsAccumulator
+from network import build_network_report
+from payload import analyze_payloads
+
+
+def find_har_files(inputs):
+    """Expands directories (recursively) and glob patterns into a sorted list of .har paths."""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, '**', '*.har'), recursive=True)
+        else:
+            matches = glob.glob(item, recursive=True)
+        paths.update(path for path in matches if os.path.isfile(path))
+    return sorted(paths)
+
+
+_worker_plan = None
+
+
+def _init_worker(rules_file):
+    global _worker_plan
+    _worker_plan = compile_rules(load_rules(rules_file)) if rules_file else default_plan()
+
+
+def analyze_har_file(path, plan=None):
+    """Parses one HAR and runs the rule engine. Returns a JSON-serializable result dict."""
+    plan = plan or _worker_plan or default_plan()
+    try:
+        # Headers are never shown here, so do not store them at all
+        df, _ = load_request_table(path, keep_headers=False)
+        hits = analyze_table(df, plan=plan)
+        network = build_network_report(df)
+        payloads = analyze_payloads(df, top=0)
+    except Exception as e:
+        return {'file': path, 'error': f"{type(e).__name__}: {e}"}
+
+    # Gather every column a finding needs for all hit rows at once
+    rows = df.loc[hits['request_index'], plan.message_columns(df)].astype(object).to_dict(orient='records')
+
+    findings = []
+    for row, rule_id, request in zip(hits['request_index'].tolist(), hits['rule_id'].astype(str).tolist(), rows):
+        findings.append({
+            'request_index': int(row),
+            'method': str(request['method']),
+            'url': str(request['url']),
+            'status': int(request['status']),
+            'time_ms': float(request['time_ms']),
+            'wait_time': float(request['wait_time']),
+            'rule_id': rule_id,
+            'severity': plan.rules[rule_id]['severity'],
+            'message': plan.format_message(rule_id, request),
+        })
+
+    return {
+        'file': path,
+        'requests': len(df),
+        'total_time_ms': float(df['time_ms'].clip(lower=0).sum()),
+        'rule_counts': dict(Counter(finding['rule_id'] for finding in findings)),
+        'redirect_chains': len(network['chains']),
+        'redirect_wasted_ms': network['redirect_wasted_ms'],
+        'missed_reuse': network['missed_reuse'],
+        'redundant_tls': network['redundant_tls'],
+        'connection_wasted_ms': network['connection_wasted_ms'],
+        'uncompressed_responses': payloads['uncompressed_responses'],
+        'compression_saved_bytes': payloads['compression_saved_bytes'],
+        'duplicate_downloads': payloads['duplicate_downloads'],
+        'duplicate_wasted_bytes': payloads['duplicate_wasted_bytes'],
+        'findings': findings,
+        # Per-domain sketches; merged into the aggregate and never written per file
+        'domain_stats': StatsAccumulator('domain').add(df),
+    }
+
+
+class JsonLinesWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8') if path and path != '-' else sys.stdout
+
+    def write_file(self, result):
+        self.file.write(json.dumps({'type': 'file', **result}, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def close(self, aggregate):
+        self.file.write(json.dumps({'type': 'aggregate', **aggregate}, ensure_ascii=False) + '\n')
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ParquetWriter:
+    """Streams findings to Parquet one row group per file; the aggregate goes to a JSON sidecar."""
+
+    def __init__(self, path):
+        if not path or path == '-':
+            raise ValueError("Parquet output needs --output PATH.")
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet output requires pyarrow; install it or use --format jsonl.")
+        self.pa = pa
+        self.path = path
+        self.schema = pa.schema([
+            ('file', pa.string()), ('request_index', pa.int64()), ('method', pa.string()),
+            ('url', pa.string()), ('status', pa.int32()), ('time_ms', pa.float64()),
+            ('wait_time', pa.float64()), ('rule_id', pa.string()), ('severity', pa.string()),
+            ('message', pa.string()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write_file(self, result):
+        rows = [{'file': result['file'], **finding} for finding in result.get('findings', [])]
+        if rows:
+            self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self, aggregate):
+        self.writer.close()
+        with open(os.path.splitext(self.path)[0] + '.summary.json', 'w', encoding='utf-8') as file:
+            json.dump(aggregate, file, indent=2, ensure_ascii=False)
+
+
+class Aggregate:
+    """
+    Running totals across files; holds counters and mergeable per-domain
+    latency sketches only, never per-file findings.
+    """
+
+    def __init__(self):
+        self.files = 0
+        self.failed = []
+        self.requests = 0
+        self.findings = 0
+        self.redirect_wasted_ms = 0.0
+        self.connection_wasted_ms = 0.0
+        self.compression_saved_bytes = 0.0
+        self.duplicate_wasted_bytes = 0.0
+        self.rule_counts = Counter()
+        self.files_per_rule = Counter()
+        self.domain_stats = StatsAccumulator('domain')
+
+    def add(self, result):
+        stats = result.pop('domain_stats', None)
+        if stats is not None:
+            self.domain_stats.merge(stats)
+        self.files += 1
+        if 'error' in result:
+            self.failed.append({'file': result['file'], 'error': result['error']})
+            return
+        self.requests += result['requests']
+        self.findings += len(result['findings'])
+        self.redirect_wasted_ms += result['redirect_wasted_ms']
+        self.connection_wasted_ms += result['connection_wasted_ms']
+        self.compression_saved_bytes += result['compression_saved_bytes']
+        self.duplicate_wasted_bytes += result['duplicate_wasted_bytes']
+        self.rule_counts.update(result['rule_counts'])
+        self.files_per_rule.update(result['rule_counts'].keys())
+
+    def to_dict(self):
+        return {
+            'files': self.files,
+            'failed': self.failed,
+            'requests': self.requests,
+            'findings': self.findings,
+            'redirect_wasted_ms': self.redirect_wasted_ms,
+            'connection_wasted_ms': self.connection_wasted_ms,
+            'compression_saved_bytes': self.compression_saved_bytes,
+            'duplicate_wasted_bytes': self.duplicate_wasted_bytes,
+            'rule_counts': dict(self.rule_counts.most_common()),
+            'files_per_rule': dict(self.files_per_rule.most_common()),
+            'domain_stats': self.domain_stats.to_frame().rename(columns={'key': 'domain'}).to_dict(orient='records'),
+        }
+
+
+def run_batch(paths, writer, workers=None, rules_file=None, aggregate=None):
+    """
+    Analyzes `paths` in a process pool and hands each result to `writer` as soon
+    as it finishes. At most two tasks per worker are in flight, so memory stays
+    bounded no matter how many files are queued. A task that raises, or whose
+    worker dies (e.g. OOM-killed), is recorded as a failed file; a broken pool
+    is replaced and the batch carries on.
+    """
+    aggregate = aggregate or Aggregate()
+    workers = workers or os.cpu_count() or 1
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules_file,))
+
+    def drain(in_flight):
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            path = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'file': path, 'error': f"{type(e).__name__}: {e}"}
+            # The aggregate takes the per-file sketches out before the result is written
+            aggregate.add(result)
+            writer.write_file(result)
+
+    pool = new_pool()
+    in_flight = {}
+    try:
+        for path in paths:
+            try:
+                future = pool.submit(analyze_har_file, path)
+            except BrokenProcessPool:
+                # A worker died; the files it took down are reported by drain, the rest go to a fresh pool
+                while in_flight:
+                    drain(in_flight)
+                pool.shutdown(wait=False)
+                pool = new_pool()
+                future = pool.submit(analyze_har_file, path)
+            in_flight[future] = path
+            if len(in_flight) >= workers * 2:
+                drain(in_flight)
+        while in_flight:
+            drain(in_flight)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return aggregate.to_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a directory or glob of HAR files without the dashboard.")
+    parser.add_argument('inputs', nargs='+', help="HAR files, directories, or glob patterns")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('-f', '--format', choices=['jsonl', 'parquet'], default='jsonl')
+    parser.add_argument('-o', '--output', default='-', help="output path ('-' for stdout, JSON Lines only)")
+    parser.add_argument('--rules', default=None, help="rule registry file (default: rules.json)")
+    args = parser.parse_args(argv)
+
+    paths = find_har_files(args.inputs)
+    if not paths:
+        parser.error("no .har files matched the given inputs")
+
+    # Compile the rules here so a bad registry is a usage error, not a failure in every worker
+    try:
+        compile_rules(load_rules(args.rules)) if args.rules else default_plan()
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid rule registry: {e}")
+
+    try:
+        writer = ParquetWriter(args.output) if args.format == 'parquet' else JsonLinesWriter(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+
+    running = Aggregate()
+    try:
+        aggregate = run_batch(paths, writer, workers=args.workers, rules_file=args.rules, aggregate=running)
+    finally:
+        # Always finish the output (e.g. the Parquet footer), even when the run is interrupted
+        writer.close(running.to_dict())
+    print(f"Analyzed {aggregate['files']} files ({len(aggregate['failed'])} failed), "
+          f"{aggregate['findings']} findings across {aggregate['requests']} requests.", file=sys.stderr)
+    return 1 if aggregate['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Benchmark harness for the parse → analyze → plot pipeline.
+
+    python benchmark.py --entries 1000 10000 100000 --output bench.json
+    python benchmark.py --entries 100000 --compare bench.json
+    python benchmark.py --imports
+
+Each stage runs in a fresh process so its peak RSS is not polluted by earlier
+stages. Untimed setup (e.g. loading the input a stage consumes) happens in the
+same process before the clock starts.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+from har_generator import write_har
+
+
+def _rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _records(path):
+    from har_parser import extract_requests, load_har_file
+    return extract_requests(load_har_file(path))
+
+
+def _table(path):
+    from har_parser import load_request_table
+    return load_request_table(path)[0]
+
+
+def _stage_load_har_file(path):
+    from har_parser import load_har_file
+    return lambda: load_har_file(path)
+
+
+def _stage_extract_requests(path):
+    from har_parser import extract_requests, load_har_file
+    har = load_har_file(path)
+    return lambda: extract_requests(har)
+
+
+def _stage_dataframe(path):
+    import pandas as pd
+    records = _records(path)
+    return lambda: pd.DataFrame(records)
+
+
+def _stage_analyze_request(path):
+    from rule_engine import analyze_request, default_plan
+    records = _records(path)
+    default_plan()
+    return lambda: [analyze_request(record) for record in records]
+
+
+def _stage_load_request_table(path):
+    from har_parser import load_request_table
+    return lambda: load_request_table(path)
+
+
+def _stage_analyze_table(path):
+    from rule_engine import analyze_table, default_plan
+    df = _table(path)
+    default_plan()
+    return lambda: analyze_table(df)
+
+
+def _stage_build_chart_data(path):
+    from visualizer import build_chart_data
+    df = _table(path)
+    return lambda: build_chart_data(df, top_n=20)
+
+
+def _plot_stage(name):
+    def stage(path):
+        import visualizer
+        df = _table(path)
+        plot = getattr(visualizer, name)
+        # Warm plotly's lazy imports so the timing covers the chart, not module loading
+        plot(df.head(50), return_fig=True)
+        return lambda: plot(df, return_fig=True)
+    return stage
+
+
+STAGES = {
+    'load_har_file': _stage_load_har_file,
+    'extract_requests': _stage_extract_requests,
+    'dataframe': _stage_dataframe,
+    'analyze_request': _stage_analyze_request,
+    'load_request_table': _stage_load_request_table,
+    'analyze_table': _stage_analyze_table,
+    'build_chart_data': _stage_build_chart_data,
+    'plot_top_slowest_requests': _plot_stage('plot_top_slowest_requests'),
+    'plot_status_code_distribution': _plot_stage('plot_status_code_distribution'),
+    'plot_domain_load_time': _plot_stage('plot_domain_load_time'),
+}
+
+
+# Cold import budgets (seconds), on top of importing pandas for modules built on it
+IMPORT_BUDGETS = {
+    'instrumentation': 0.05,
+    'analysis_cache': 0.05,
+    'har_parser': 0.15,
+    'rule_engine': 0.15,
+    'visualizer': 0.15,
+    'llm_summary': 0.2,
+    'batch': 0.25,
+}
+# Modules a cold import must not pull in
+_UI_MODULES = ['streamlit', 'plotly.express', 'openai']
+IMPORT_FORBIDDEN = {
+    'instrumentation': ['pandas'] + _UI_MODULES,
+    'analysis_cache': ['pandas'] + _UI_MODULES,
+    'har_parser': _UI_MODULES,
+    'rule_engine': _UI_MODULES,
+    'visualizer': _UI_MODULES,
+    'llm_summary': _UI_MODULES,
+    'batch': _UI_MODULES,
+}
+# Shared heavy dependencies; a module's own import time is measured with these already loaded
+IMPORT_PRELOAD = ['numpy', 'pandas']
+_IMPORT_PROBE = ("import sys, time; {preload}start = time.perf_counter(); import {module}; "
+                 "print(time.perf_counter() - start); print(' '.join(sys.modules))")
+
+
+def _cold_import(module, preload=()):
+    """Import time of `module` in a fresh interpreter (after importing `preload`), and the modules it left loaded."""
+    code = _IMPORT_PROBE.format(module=module, preload=''.join(f"import {name}; " for name in preload))
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True,
+                            text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    seconds, loaded = output.splitlines()[:2]
+    return float(seconds), set(loaded.split())
+
+
+def _forbidden(module, loaded):
+    return [name for name in IMPORT_FORBIDDEN.get(module, []) if name in loaded]
+
+
+def check_forbidden_imports():
+    """
+    Imports each module in `IMPORT_FORBIDDEN` in a fresh interpreter and
+    returns (module, forbidden modules it loaded) pairs. Unlike
+    `check_imports` this involves no timing, so its result is deterministic.
+    """
+    violations = []
+    for module in IMPORT_FORBIDDEN:
+        forbidden = _forbidden(module, _cold_import(module)[1])
+        if forbidden:
+            violations.append((module, forbidden))
+    return violations
+
+
+def check_imports(repeat=3):
+    """
+    Times a cold import of each module in `IMPORT_BUDGETS` (best of `repeat`
+    fresh interpreters) and checks it loads nothing from `IMPORT_FORBIDDEN`.
+    The budget applies to the module's own time: modules that use pandas are
+    timed again in interpreters where `IMPORT_PRELOAD` is already imported.
+    Returns the list of violations.
+    """
+    violations = []
+    for module, budget in IMPORT_BUDGETS.items():
+        runs = [_cold_import(module) for _ in range(repeat)]
+        seconds = min(run[0] for run in runs)
+        loaded = runs[0][1]
+        own = seconds
+        if any(name in loaded for name in IMPORT_PRELOAD):
+            own = min(_cold_import(module, IMPORT_PRELOAD)[0] for _ in range(repeat))
+        flags = []
+        if own > budget:
+            flags.append(f"over budget ({budget:.2f} s)")
+        forbidden = _forbidden(module, loaded)
+        if forbidden:
+            flags.append(f"imports {', '.join(forbidden)}")
+        violations += [(module, flag) for flag in flags]
+        print(f"{module:<20}{seconds:>8.3f} s  ({own:.3f} s own)  {'  '.join(flags) or 'ok'}")
+    return violations
+
+
+def run_stage(name, path, repeat):
+    """Runs one stage `repeat` times in the current process; returns the best wall time and RSS."""
+    func = STAGES[name](path)
+    rss_before = _rss_mb()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    peak = _rss_mb()
+    return {'wall_s': best, 'peak_rss_mb': peak, 'rss_delta_mb': peak - rss_before}
+
+
+def benchmark(sizes, stages, repeat=1, seed=0, workdir=None):
+    results = []
+    context = get_context('spawn')
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for size in sizes:
+            path = write_har(os.path.join(tmp, f"synthetic_{size}.har"), size, seed)
+            file_mb = os.path.getsize(path) / (1024 * 1024)
+            for name in stages:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(run_stage, name, path, repeat).result()
+                result.update({
+                    'stage': name,
+                    'entries': size,
+                    'file_mb': round(file_mb, 2),
+                    'entries_per_s': size / result['wall_s'] if result['wall_s'] else None,
+                })
+                results.append(result)
+                print(f"{name:<32}{size:>9} entries  {result['wall_s']:>9.4f} s  "
+                      f"{result['entries_per_s']:>12,.0f} entries/s  peak {result['peak_rss_mb']:>8.1f} MB "
+                      f"(+{result['rss_delta_mb']:.1f})", file=sys.stderr)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Prints per-stage ratios against a saved run. Returns the regressed (stage, entries) pairs."""
+    previous = {(r['stage'], r['entries']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['stage'], result['entries']))
+        if not before:
+            continue
+        ratio = result['wall_s'] / before['wall_s'] if before['wall_s'] else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions.append((result['stage'], result['entries']))
+        print(f"{result['stage']:<32}{result['entries']:>9}  {before['wall_s']:.4f} s -> "
+              f"{result['wall_s']:.4f} s  ({ratio:.2f}x){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark HAR parsing, rule evaluation and plotting.")
+    parser.add_argument('-n', '--entries', type=int, nargs='+', default=[1000, 10000],
+                        help="synthetic capture sizes to benchmark")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=1, help="runs per stage; the fastest is kept")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help="write results as JSON for later comparison")
+    parser.add_argument('--compare', help="previous results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="allowed slowdown before a stage is reported as a regression")
+    parser.add_argument('--workdir', help="where to write the synthetic HAR files (default: system temp)")
+    parser.add_argument('--imports', '--check-imports', action='store_true',
+                        help="check cold import times against IMPORT_BUDGETS instead; exits 1 on a violation")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        return 1 if check_imports(max(args.repeat, 3)) else 0
+
+    results = benchmark(args.entries, args.stages, repeat=args.repeat, seed=args.seed, workdir=args.workdir)
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': args.seed,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Cross-HAR comparison: match requests between a baseline capture and one or
+more others by (method, normalized URL) and report per-endpoint timing deltas.
+
+    python compare.py good.har slow.har --top 20
+    python compare.py good.har slow1.har slow2.har --output deltas.csv
+
+Matching goes through hash joins on the endpoint key, so comparing two 50k
+entry captures is linear rather than a nested loop.
+"""
+import argparse
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from har_parser import load_request_table
+
+PHASES = ['dns_time', 'connect_time', 'ssl_time', 'wait_time', 'time_ms']
+
+# Whole path segments replaced by placeholders, applied in order
+_SEGMENT_PATTERNS = [
+    (re.compile(r'(?<=/)[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(?=/|$)', re.IGNORECASE), '{uuid}'),
+    (re.compile(r'(?<=/)\d+(?=/|$)'), '{n}'),
+    (re.compile(r'(?<=/)[0-9a-f]{16,}(?=/|$)', re.IGNORECASE), '{hash}'),
+    # 15/18-character Salesforce record IDs (always contain a digit)
+    (re.compile(r'(?<=/)(?=[A-Za-z0-9]*\d)(?:[A-Za-z0-9]{18}|[A-Za-z0-9]{15})(?=/|$)'), '{id}'),
+    # Long digit runs inside a segment, e.g. cache-busted file names
+    (re.compile(r'\d{4,}'), '{n}'),
+]
+_QUERY_NAMES = re.compile(r'(?:^|&)([^=&]+)')
+
+
+def normalize_path(path):
+    for pattern, placeholder in _SEGMENT_PATTERNS:
+        path = pattern.sub(placeholder, path)
+    return path
+
+
+def normalize_url(url, _paths=None):
+    """
+    Reduces a URL to its endpoint: lowercased host, IDs/numbers/hashes in the
+    path replaced by placeholders, fragment dropped and the query string
+    reduced to its sorted parameter names (values are treated as noise).
+    """
+    url = url.split('#', 1)[0]
+    base, _, query = url.partition('?')
+    scheme, sep, rest = base.partition('://')
+    if sep:
+        netloc, slash, path = rest.partition('/')
+        prefix, path = f"{scheme}://{netloc.lower()}", slash + path
+    else:
+        prefix, path = '', base
+
+    # Many URLs differ only in query values, so callers may memoize paths
+    if _paths is None:
+        path = normalize_path(path)
+    elif path in _paths:
+        path = _paths[path]
+    else:
+        path = _paths[path] = normalize_path(path)
+
+    params = sorted(set(_QUERY_NAMES.findall(query)))
+    return f"{prefix}{path}?{'&'.join(params)}" if params else f"{prefix}{path}"
+
+
+def normalized_urls(df):
+    """`normalize_url` for every row, computed once per distinct URL."""
+    urls = pd.Categorical(df['url'])
+    paths = {}
+    mapped = np.array([normalize_url(str(url), paths) for url in urls.categories], dtype=object)
+    return pd.Series(mapped[urls.codes], index=df.index, name='endpoint')
+
+
+def endpoint_stats(df, stat='median'):
+    """
+    Per-endpoint request count and `stat` of each timing phase, keyed by
+    (method, endpoint). Phases recorded as -1 (not captured) are ignored.
+    """
+    frame = pd.DataFrame({
+        'method': df['method'].astype(str).to_numpy(),
+        'endpoint': normalized_urls(df).to_numpy(),
+    })
+    for phase in PHASES:
+        values = df[phase].to_numpy(dtype='float64') if phase in df.columns else np.full(len(df), np.nan)
+        frame[phase] = np.where(values < 0, np.nan, values)
+
+    grouped = frame.groupby(['method', 'endpoint'], sort=False)
+    stats = grouped[PHASES].agg(stat)
+    stats.insert(0, 'count', grouped.size())
+    return stats
+
+
+def compare_tables(baseline, other, stat='median'):
+    """
+    Joins two request tables (or `extract_requests` record lists) on
+    (method, endpoint). One row per endpoint seen in either capture, with
+    baseline/other counts, each phase's baseline and other value and their
+    delta, and `match` = both | new | missing. Sorted by time_ms delta.
+    """
+    if not isinstance(baseline, pd.DataFrame):
+        baseline = pd.DataFrame(baseline)
+    if not isinstance(other, pd.DataFrame):
+        other = pd.DataFrame(other)
+
+    joined = endpoint_stats(baseline, stat).join(
+        endpoint_stats(other, stat), how='outer', lsuffix='_baseline', rsuffix='_other')
+
+    result = pd.DataFrame(index=joined.index)
+    result['count_baseline'] = joined['count_baseline'].fillna(0).astype('int64')
+    result['count_other'] = joined['count_other'].fillna(0).astype('int64')
+    result['match'] = np.select(
+        [(result['count_baseline'] > 0) & (result['count_other'] > 0), result['count_other'] > 0],
+        ['both', 'new'], default='missing')
+    for phase in PHASES:
+        result[f"{phase}_baseline"] = joined[f"{phase}_baseline"]
+        result[f"{phase}_other"] = joined[f"{phase}_other"]
+        result[f"{phase}_delta"] = joined[f"{phase}_other"] - joined[f"{phase}_baseline"]
+
+    result = result.reset_index()
+    return result.sort_values('time_ms_delta', ascending=False, na_position='last', kind='stable') \
+        .reset_index(drop=True)
+
+
+def compare_hars(baseline_path, other_paths, stat='median'):
+    """Compares each HAR in `other_paths` against `baseline_path`. Returns {path: comparison}."""
+    baseline, _ = load_request_table(baseline_path, keep_headers=False)
+    comparisons = {}
+    for path in other_paths:
+        other, _ = load_request_table(path, keep_headers=False)
+        comparisons[path] = compare_tables(baseline, other, stat)
+    return comparisons
+
+
+def summarize_comparison(comparison):
+    counts = comparison['match'].value_counts()
+    both = comparison[comparison['match'] == 'both']
+    return {
+        'matched_endpoints': int(counts.get('both', 0)),
+        'new_endpoints': int(counts.get('new', 0)),
+        'missing_endpoints': int(counts.get('missing', 0)),
+        **{f"{phase}_delta_total": float(
+            (both[f"{phase}_delta"] * both['count_other']).sum()) for phase in PHASES},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare HAR captures against a baseline, endpoint by endpoint.")
+    parser.add_argument('baseline', help="known-good HAR file")
+    parser.add_argument('others', nargs='+', help="HAR files to compare against the baseline")
+    parser.add_argument('--stat', choices=['median', 'mean', 'max'], default='median')
+    parser.add_argument('--top', type=int, default=20, help="endpoints to print per comparison")
+    parser.add_argument('-o', '--output', help="write all comparisons to this CSV file")
+    args = parser.parse_args(argv)
+
+    comparisons = compare_hars(args.baseline, args.others, args.stat)
+    columns = ['match', 'method', 'endpoint', 'count_baseline', 'count_other',
+               'time_ms_delta', 'wait_time_delta', 'dns_time_delta', 'connect_time_delta', 'ssl_time_delta']
+    with pd.option_context('display.width', 200, 'display.max_colwidth', 70):
+        for path, comparison in comparisons.items():
+            print(f"\n=== {path} vs {args.baseline} ===")
+            print(summarize_comparison(comparison))
+            print(comparison[columns].head(args.top).to_string(index=False))
+
+    if args.output:
+        frames = [comparison.assign(capture=path) for path, comparison in comparisons.items()]
+        pd.concat(frames, ignore_index=True).to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
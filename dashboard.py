@@ -1,13 +1,27 @@
 import json
+import os
 import streamlit as st
-import pandas as pd
-from har_parser import extract_requests
-from visualizer import plot_top_slowest_requests, plot_status_code_distribution, plot_domain_load_time
-from rule_engine import analyze_request
-from llm_summary import summarize_issues
+from analysis_cache import ByteLRUCache, cache_budget_bytes, content_hash
+from instrumentation import PROFILE_MODES, TRACE_FILE_ENV, Recorder, debug_enabled, lap
+# The analysis modules (pandas, plotly, OpenAI) are imported once a capture is selected,
+# so a fresh session renders the upload page without paying for them
+
+# Same variable as store.STORE_DIR_ENV; checked before importing the store module
+STORE_DIR_ENV = 'HAR_ANALYZER_STORE'
 
 st.set_page_config(page_title="HAR Analyzer", layout="wide")
 
+# Flagged requests shown per page in the rule insights detail table
+INSIGHTS_PAGE_SIZE = 25
+# Upper bound on points in the concurrency chart
+TIMELINE_BUCKETS = 500
+# Endpoints listed in the baseline comparison table
+COMPARISON_ROWS = 50
+# Redirect chains listed, longest wasted time first
+CHAIN_ROWS = 50
+# How often a pending AI summary is checked
+SUMMARY_POLL_SECONDS = 1.0
+
 # --- Header
 st.title("🧪 HAR File Analyzer")
 st.caption("Version 1.3 – Last updated May 20, 2025")
@@ -16,29 +30,147 @@ st.markdown("Upload a `.har` file to visualize performance data and issues.")
 # --- File Uploader
 uploaded_file = st.file_uploader("Upload HAR file", type=["har"])
 
+# --- Optional per-org rule thresholds (defaults come from rules.json)
+rules_file = st.file_uploader("Custom rule registry (optional)", type=["json", "yaml", "yml"])
+
+# --- Optional known-good capture to diff the uploaded HAR against
+baseline_file = st.file_uploader("Baseline HAR for comparison (optional)", type=["har"])
+
 # --- Add security disclaimer banner
 st.warning(
-    "Note: This tool does not store HAR data and automatically redacts common sensitive headers. "
+    "Note: This tool does not store HAR data unless you explicitly save an analysis to a local store, "
+    "and automatically redacts common sensitive headers. "
     "However, please avoid uploading files that may include authentication tokens, session cookies, or PII in URLs or payloads."
 )
 
-if uploaded_file:
-    try:
-        # --- Load HAR content
-        har_data = json.load(uploaded_file)
-        requests = extract_requests(har_data)
 
-        st.success(f"✅ Successfully loaded {len(requests)} requests.")
 
-        # --- Convert to DataFrame
-        df = pd.DataFrame(requests)
-        df['status_category'] = df['status'].apply(lambda s: f"{s // 100}xx")
-        df['is_slow_ttfb'] = df['wait_time'] > 500
-        df['mime_group'] = df['mime_type'].apply(lambda m: m.split('/')[0] if isinstance(m, str) else 'other')
+@st.cache_resource
+def get_analysis_cache():
+    # One process-wide cache shared by every session, bounded by total bytes
+    return ByteLRUCache(cache_budget_bytes())
+
+
+@st.cache_resource
+def get_capture_store():
+    # The on-disk store is opt-in: only enabled when a store directory is configured
+    if not os.environ.get(STORE_DIR_ENV):
+        return None
+    from store import CaptureStore
+    return CaptureStore(os.environ[STORE_DIR_ENV])
+
+
+@st.cache_resource
+def get_summary_service():
+    # Summaries run on worker threads shared by all sessions, never in the script thread
+    from llm_summary import SummaryService
+    return SummaryService()
+
+
+def openai_api_key():
+    # Secrets are optional; the backend also falls back to OPENAI_API_KEY
+    try:
+        return st.secrets["openai"]["api_key"]
+    except Exception:
+        return None
+
+
+def render_debug_panel(recorder):
+    # Per-stage timings of this run; nested stages only appear when their result was not cached
+    with st.expander("🛠️ Debug: stage timings", expanded=True):
+        spans = recorder.to_frame()
+        spans['name'] = ['\u2003' * depth + name for depth, name in zip(spans['depth'], spans['name'])]
+        st.metric("Recorded Run Time", f"{recorder.to_dict()['total_ms']:,.0f} ms")
+        st.dataframe(spans.drop(columns=['depth']), hide_index=True, use_container_width=True)
+        dcol1, dcol2 = st.columns(2)
+        dcol1.download_button("Download timings (JSON)", recorder.to_json(), file_name="har_analyzer_timings.json")
+        dcol2.download_button("Download spans (OTLP/JSON)", json.dumps(recorder.to_otel()),
+                              file_name="har_analyzer_spans.json")
+        if recorder.profile:
+            st.code(recorder.profile)
+
+
+# --- Optional debug controls, only shown when HAR_ANALYZER_DEBUG is set
+debug_mode = debug_enabled()
+profile_mode = None
+if debug_mode:
+    with st.sidebar:
+        st.markdown("### 🛠️ Debug")
+        profile_mode = st.selectbox("Profile this run", [None] + PROFILE_MODES,
+                                    format_func=lambda mode: "off" if mode is None else mode)
+
+capture_store = get_capture_store()
+stored_capture = None
+if capture_store is not None and not uploaded_file:
+    stored = capture_store.captures()
+    if not stored.empty:
+        names = dict(zip(stored['capture_id'], stored['name']))
+        stored_capture = st.selectbox(
+            "Or reopen a stored capture",
+            options=[None] + list(names),
+            format_func=lambda capture_id: "—" if capture_id is None else f"{names[capture_id]} ({capture_id[:12]})",
+        )
+
+
+if uploaded_file or stored_capture:
+    recorder = Recorder('dashboard').start(profile_mode) if debug_mode else None
+    try:
+        lap('load')
+        from har_parser import load_request_table
+        from visualizer import build_chart_data, plot_top_slowest_requests, plot_status_code_distribution, plot_domain_load_time, plot_concurrency, plot_latency_percentiles
+        from timeline import build_timeline, bucket_concurrency
+        from rule_engine import FINDING_COLUMNS, analyze_table, compile_rules, load_rules, default_plan, summarize_hits
+        from llm_summary import MODELS, aggregate_findings, get_backend
+        from compare import compare_tables, summarize_comparison
+        from stats import group_stats
+        from network import build_network_report
+        from payload import analyze_payloads
+        from filter_index import FilterIndex
+        import numpy as np
+
+        analysis_cache = get_analysis_cache()
+
+        # --- Load HAR content (streamed entry by entry into a columnar table);
+        # reruns for the same file reuse the parsed table and derived columns.
+        # Stored captures are keyed by the same content hash and memory-mapped back in.
+        if uploaded_file:
+            har_key = content_hash(uploaded_file)
+            df, request_headers = analysis_cache.get_or_compute(
+                ('table', har_key), lambda: load_request_table(uploaded_file))
+        else:
+            har_key = stored_capture
+            df, request_headers = analysis_cache.get_or_compute(
+                ('table', har_key), lambda: capture_store.open(har_key))
+
+        st.success(f"✅ Successfully loaded {len(df)} requests.")
+
+        # --- Compile the rule registry once for this run
+        lap('rules')
+        try:
+            rule_plan = compile_rules(load_rules(rules_file)) if rules_file else default_plan()
+        except ValueError as e:
+            st.error(f"❌ Invalid rule registry: {e}")
+            st.stop()
+        ttfb_threshold = rule_plan.threshold("Slow TTFB", 500)
+
+        # --- Rule hits over the whole capture, cached per file and rule set
+        all_hits = analysis_cache.get_or_compute(
+            ('hits', har_key, rule_plan.fingerprint), lambda: analyze_table(df, plan=rule_plan))
+
+        if capture_store is not None and uploaded_file and har_key not in capture_store:
+            if st.button("💾 Save analysis to local store"):
+                capture_store.save(har_key, df, request_headers, all_hits,
+                                   name=getattr(uploaded_file, 'name', ''), plan=rule_plan)
+                st.success("Saved. This capture can be reopened without uploading it again.")
+
+        # --- Value bitmaps and sorted timing indexes, built once per file; filter changes only combine them
+        filter_index = analysis_cache.get_or_compute(('filter_index', har_key), lambda: FilterIndex(df))
 
         # --- Set filter defaults
+        lap('filters')
         status_options = ['2xx', '3xx', '4xx', '5xx']
-        mime_options = sorted(df['mime_group'].dropna().unique())
+        mime_options = sorted(filter_index.options('mime_group'))
+        max_duration = int(np.ceil(df['time_ms'].max())) if len(df) else 0
 
         if 'status_filter' not in st.session_state:
             st.session_state.status_filter = status_options
@@ -46,6 +178,10 @@ if uploaded_file:
             st.session_state.ttfb_filter = False
         if 'mime_filter' not in st.session_state:
             st.session_state.mime_filter = mime_options
+        if 'domain_filter' not in st.session_state:
+            st.session_state.domain_filter = []
+        if 'method_filter' not in st.session_state:
+            st.session_state.method_filter = []
 
         # --- Sidebar Filters
         with st.expander("🔍 Show Filters", expanded=False):
@@ -56,7 +192,7 @@ if uploaded_file:
             )
 
             st.session_state.ttfb_filter = st.checkbox(
-                "Show only slow TTFB (>500ms)",
+                f"Show only slow TTFB (>{ttfb_threshold}ms)",
                 value=st.session_state.ttfb_filter
             )
 
@@ -66,106 +202,316 @@ if uploaded_file:
                 default=st.session_state.mime_filter
             )
 
-        # --- Apply Filters
-        filtered_df = df[
-            df['status_category'].isin(st.session_state.status_filter) &
-            df['mime_group'].isin(st.session_state.mime_filter)
-        ]
+            # Empty means every domain / method; options list the busiest first
+            domain_counts = filter_index.counts('domain')
+            st.session_state.domain_filter = st.multiselect(
+                "Domains (all if empty)",
+                options=filter_index.options('domain'),
+                default=[domain for domain in st.session_state.domain_filter if domain_counts.get(domain)],
+                format_func=lambda domain: f"{domain} ({domain_counts[domain]})",
+            )
+
+            st.session_state.method_filter = st.multiselect(
+                "Methods (all if empty)",
+                options=filter_index.options('method'),
+                default=[method for method in st.session_state.method_filter
+                         if method in filter_index.options('method')],
+            )
+
+            duration_range = st.slider("Duration (ms)", min_value=0, max_value=max(max_duration, 1),
+                                       value=(0, max(max_duration, 1)))
+
+        # --- Apply Filters: a bitmap intersection; the table itself is never filtered or copied
+        filter_ranges = {}
+        if duration_range != (0, max(max_duration, 1)):
+            filter_ranges['time_ms'] = (duration_range[0], duration_range[1])
         if st.session_state.ttfb_filter:
-            filtered_df = filtered_df[filtered_df['is_slow_ttfb']]
+            filter_ranges['wait_time'] = (np.nextafter(ttfb_threshold, np.inf), None)
+        filter_bits = filter_index.select({
+            'status_category': st.session_state.status_filter,
+            'mime_group': st.session_state.mime_filter,
+            'domain': st.session_state.domain_filter or None,
+            'method': st.session_state.method_filter or None,
+        }, filter_ranges)
+        filter_mask = filter_index.mask(filter_bits)
+        # Value bitmaps are built on first use; re-charge the cache entry with the index's current size
+        analysis_cache.put(('filter_index', har_key), filter_index)
+        filtered_rows = filter_index.positions(filter_bits)
+        filtered_count = filter_index.count(filter_bits)
 
         st.markdown("---")
-        st.metric(label="🎯 Filtered Requests", value=len(filtered_df))
+        st.metric(label="🎯 Filtered Requests", value=filtered_count)
 
         # --- Charts
         # --- User control for how many requests to show in charts
         top_n = st.slider("Number of requests to show in charts", min_value=5, max_value=100, value=20, step=5)
 
+        # --- Aggregates for every chart, computed once for this filtered view
+        lap('charts', entries=filtered_count)
+        chart_data = build_chart_data(
+            df, top_n=top_n,
+            status_counts=filter_index.counts('status_category', filter_bits),
+            slowest_rows=filter_index.largest('time_ms', top_n, filter_bits),
+            domain_totals=filter_index.totals('domain', df['time_ms'], filter_bits),
+        )
+
         st.markdown("---")
         st.subheader("📊 Request Performance Charts")
 
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("#### Top Slowest Requests")
-            fig1 = plot_top_slowest_requests(filtered_df, top_n=top_n, return_fig=True)
+            fig1 = plot_top_slowest_requests(df, return_fig=True, chart_data=chart_data)
             st.plotly_chart(fig1, use_container_width=True)
 
         with col2:
             st.markdown("#### Status Code Distribution")
-            fig2 = plot_status_code_distribution(filtered_df, return_fig=True)
+            fig2 = plot_status_code_distribution(df, return_fig=True, chart_data=chart_data)
             st.plotly_chart(fig2, use_container_width=True)
 
         st.markdown("---")
         st.subheader("🌐 Top Domains by Total Load Time")
 
-        fig3 = plot_domain_load_time(filtered_df, return_fig=True)
+        fig3 = plot_domain_load_time(df, return_fig=True, chart_data=chart_data)
         st.plotly_chart(fig3, use_container_width=True)
 
+        st.markdown("---")
+        st.subheader("📈 Latency Percentiles")
+        lap('latency', entries=filtered_count)
+
+        # Totals reward chatty domains; percentiles and phase shares show where the tail comes from
+        stats_by = st.radio("Group by", options=['domain', 'endpoint'], horizontal=True)
+        latency_stats = group_stats(df, by=stats_by, rows=filtered_rows)
+        fig5 = plot_latency_percentiles(latency_stats, return_fig=True)
+        st.plotly_chart(fig5, use_container_width=True)
+        st.dataframe(
+            latency_stats,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                'key': st.column_config.TextColumn(stats_by.capitalize()),
+                **{column: st.column_config.NumberColumn(format="%.0f")
+                   for column in ['p50_time_ms', 'p90_time_ms', 'p99_time_ms', 'total_time_ms']},
+                **{column: st.column_config.ProgressColumn(min_value=0.0, max_value=1.0, format="%.2f")
+                   for column in latency_stats.columns if column.endswith('_share')},
+            },
+        )
+
+        st.markdown("---")
+        st.subheader("⏱️ Timeline & Critical Path")
+        lap('timeline')
+
+        # Whole-capture waterfall; independent of filters, so cached per file
+        timeline = analysis_cache.get_or_compute(('timeline', har_key), lambda: build_timeline(df))
+
+        tcol1, tcol2, tcol3, tcol4 = st.columns(4)
+        tcol1.metric("Capture Span", f"{timeline['span_ms']:,.0f} ms")
+        tcol2.metric("Critical Path", f"{timeline['critical_path_ms']:,.0f} ms")
+        tcol3.metric("Peak Concurrency", timeline['max_concurrency'])
+        tcol4.metric("Idle Time", f"{timeline['idle_ms']:,.0f} ms")
+
+        if not timeline['concurrency'].empty:
+            bucket_ms = max(1.0, timeline['span_ms'] / TIMELINE_BUCKETS)
+            fig4 = plot_concurrency(bucket_concurrency(timeline['concurrency'], bucket_ms), return_fig=True)
+            st.plotly_chart(fig4, use_container_width=True)
+
+        st.markdown("#### Critical Path")
+        st.caption("Requests that gated the last response, linked through initiator/referer. "
+                   "Slow requests outside this chain ran in parallel and did not delay page completion.")
+        st.dataframe(timeline['critical_path'], hide_index=True, use_container_width=True)
+
+        st.markdown("---")
+        st.subheader("🔁 Redirects & Connection Reuse")
+        lap('network')
+
+        # Whole-capture pass like the timeline, cached per file
+        network = analysis_cache.get_or_compute(('network', har_key), lambda: build_network_report(df))
+
+        ncol1, ncol2, ncol3, ncol4 = st.columns(4)
+        ncol1.metric("Redirect Chains", len(network['chains']))
+        ncol2.metric("Time in Redirects", f"{network['redirect_wasted_ms']:,.0f} ms")
+        ncol3.metric("Missed Keep-Alive Reuse", network['missed_reuse'])
+        ncol4.metric("Avoidable Setup Time", f"{network['connection_wasted_ms']:,.0f} ms")
+
+        if not network['chains'].empty:
+            st.markdown("#### Redirect Chains")
+            st.caption("Rebuilt by following each 3xx Location to the next request for that URL. "
+                       "Wasted time is the time spent on the redirect responses themselves.")
+            st.dataframe(network['chain_hosts'], hide_index=True, use_container_width=True)
+            st.dataframe(network['chains'].head(CHAIN_ROWS), hide_index=True, use_container_width=True)
+
+        st.markdown("#### Connections per Host")
+        st.caption("Missed reuse: a new TCP connection opened while an earlier connection to the same host was idle. "
+                   "Redundant TLS: a handshake on a connection id that had already served a request.")
+        st.dataframe(network['hosts'], hide_index=True, use_container_width=True)
+
+        st.markdown("---")
+        st.subheader("📦 Payload & Caching")
+        lap('payload')
+
+        payloads = analysis_cache.get_or_compute(('payload', har_key), lambda: analyze_payloads(df, top=CHAIN_ROWS))
+
+        pcol1, pcol2, pcol3, pcol4 = st.columns(4)
+        pcol1.metric("Transferred", f"{payloads['total_wire_bytes'] / 1e6:,.1f} MB")
+        pcol2.metric("Uncompressed Responses", payloads['uncompressed_responses'],
+                     help=f"~{payloads['compression_saved_bytes'] / 1e6:,.1f} MB / "
+                          f"{payloads['compression_saved_ms']:,.0f} ms saved with gzip/br")
+        pcol3.metric("Duplicate Downloads", payloads['duplicate_downloads'],
+                     help=f"{payloads['duplicate_wasted_bytes'] / 1e6:,.1f} MB / "
+                          f"{payloads['duplicate_wasted_ms']:,.0f} ms spent re-fetching")
+        pcol4.metric("Cacheable Assets Re-downloaded", payloads['cacheable_redownloads'])
+
+        if not payloads['uncompressed'].empty:
+            st.markdown("#### Uncompressed Responses")
+            st.caption("Compressible bodies over ~1.4 KB sent without content-encoding. Savings use the "
+                       "compression ratio seen for the same type elsewhere in the capture.")
+            st.dataframe(payloads['uncompressed'], hide_index=True, use_container_width=True)
+
+        if not payloads['duplicates'].empty:
+            st.markdown("#### Duplicate Downloads")
+            st.caption("Successful GETs fetched over the network more than once (matched by body hash when "
+                       "the HAR includes content, else by URL). Cacheable ones point to a caching problem.")
+            st.dataframe(payloads['duplicates'].head(CHAIN_ROWS).drop(columns=['key']),
+                         hide_index=True, use_container_width=True)
+
+        st.markdown("#### Cache Policies")
+        st.dataframe(payloads['cache_policies'], hide_index=True, use_container_width=True)
+
+        if baseline_file:
+            st.markdown("---")
+            st.subheader("🆚 Comparison Against Baseline")
+            lap('comparison')
+
+            baseline_key = content_hash(baseline_file)
+            # Kept without headers, so cached apart from tables loaded for display
+            baseline_df, _ = analysis_cache.get_or_compute(
+                ('baseline_table', baseline_key), lambda: load_request_table(baseline_file, keep_headers=False))
+            comparison = analysis_cache.get_or_compute(
+                ('comparison', baseline_key, har_key), lambda: compare_tables(baseline_df, df))
+            comparison_summary = summarize_comparison(comparison)
+
+            ccol1, ccol2, ccol3, ccol4 = st.columns(4)
+            ccol1.metric("Matched Endpoints", comparison_summary['matched_endpoints'])
+            ccol2.metric("New Endpoints", comparison_summary['new_endpoints'])
+            ccol3.metric("Missing Endpoints", comparison_summary['missing_endpoints'])
+            ccol4.metric("Added Wait Time", f"{comparison_summary['wait_time_delta_total']:,.0f} ms")
+
+            st.caption("Endpoints are matched on method and URL with IDs, numbers and query values stripped. "
+                       "Deltas are this capture's median minus the baseline's.")
+            match_filter = st.multiselect("Endpoints", options=['both', 'new', 'missing'], default=['both'])
+            shown = comparison[comparison['match'].isin(match_filter)].head(COMPARISON_ROWS)
+            st.dataframe(
+                shown[['match', 'method', 'endpoint', 'count_baseline', 'count_other', 'time_ms_delta',
+                       'wait_time_delta', 'dns_time_delta', 'connect_time_delta', 'ssl_time_delta']],
+                hide_index=True,
+                use_container_width=True,
+            )
+
         st.markdown("---")
         st.subheader("🧠 Rule-Based Insights")
-        # --- Rule Analysis + Expanders
-        requests_with_issues = []
-
-        for req in filtered_df.to_dict(orient="records"):
-            issues = analyze_request(req)
-            if issues:
-                req['issues'] = issues
-                requests_with_issues.append(req)
-                title = f"{req['method']} {req['url'][:90]}"
-                with st.expander(title):
-                    for issue in sorted(issues, key=lambda i: i['severity']):
-                        rule_name = issue.get("rule_id", issue["message"].split(":")[0])
-
-                        # Issue Summary
-                        st.markdown(f"** {issue['severity'].capitalize()}** — {issue['message']}")
-
-                        # General Suggestion
-                        if 'suggestion' in issue:
-                            st.markdown(f"🧠 **Suggestion:** {issue['suggestion']}")
-                            st.markdown(" ")
-
-                        # Salesforce Context
-                        if 'sf_context' in issue:
-                            st.markdown(f"💼 **SF Context:** {issue['sf_context']}")
-                            st.markdown(" ")
-
-                        # Suggested Next Steps
-                        if "next_step" in issue:
-                            st.markdown("🔍 **Suggested Next Steps:**")
-                            for line in issue["next_step"].split("\n"):
-                                st.markdown(f"- {line.strip()}")
-                            st.markdown(" ")
-
-                        # Visual Divider Between Issues
-                        st.markdown("---")
-
-                    # Request Summary Footer
-                    st.markdown(f"`Status: {req['status']} | Time: {req['time_ms']} ms | TTFB: {req['wait_time']} ms`")
+        lap('insights')
+
+        # The request table has a RangeIndex, so hit labels double as mask positions
+        hits = all_hits if filter_bits is None else all_hits[filter_mask[all_hits['request_index'].to_numpy()]]
+
+        if hits.empty:
+            st.info("No rule findings for the current filters.")
+        else:
+            # --- One summary row per rule, regardless of how many requests were flagged
+            rule_summary = summarize_hits(hits, df, plan=rule_plan)
+            st.dataframe(
+                rule_summary.drop(columns=['rule_id']),
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    'p50_time_ms': st.column_config.NumberColumn("p50 Time (ms)", format="%.0f"),
+                    'p95_time_ms': st.column_config.NumberColumn("p95 Time (ms)", format="%.0f"),
+                },
+            )
+
+            # --- Details are only built for the selected rule and page
+            counts = dict(zip(rule_summary['rule_id'], rule_summary['count']))
+            selected_rule = st.selectbox(
+                "Inspect rule",
+                options=list(counts),
+                format_func=lambda rule_id: f"{rule_id} ({counts[rule_id]} requests)",
+            )
+            rule = rule_plan.rules[selected_rule]
+
+            st.markdown(f"**{rule['severity'].capitalize()}** — {rule['rule']}")
+            st.markdown(f"🧠 **Suggestion:** {rule['suggestion']}")
+            st.markdown(f"💼 **SF Context:** {rule['sf_context']}")
+            st.markdown("🔍 **Suggested Next Steps:**\n" +
+                        "\n".join(f"- {line.strip()}" for line in rule['next_step'].split("\n")))
+
+            rule_rows = hits.loc[hits['rule_id'] == selected_rule, 'request_index'].to_numpy()
+            page_count = max(1, -(-len(rule_rows) // INSIGHTS_PAGE_SIZE))
+            page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+            page_rows = rule_rows[(page - 1) * INSIGHTS_PAGE_SIZE:page * INSIGHTS_PAGE_SIZE]
+
+            # Messages read the rule's own field, which may not be one of the displayed columns
+            rows = df.loc[page_rows, rule_plan.message_columns(df)]
+            details = rows[FINDING_COLUMNS].copy()
+            details.insert(0, 'message', [rule_plan.format_message(selected_rule, req)
+                                          for req in rows.to_dict(orient="records")])
+            st.dataframe(details, use_container_width=True)
+
+            # Headers live in a side table and are only rendered on request
+            header_row = st.selectbox(
+                "Show request headers for",
+                options=[None] + page_rows.tolist(),
+                format_func=lambda row: "—" if row is None else f"#{row} {df.at[row, 'method']} {str(df.at[row, 'url'])[:90]}",
+            )
+            if header_row is not None:
+                st.table(request_headers[header_row])
 
         # --- AI Summary Toggle
+        lap('ai_summary')
         st.markdown("---")
-        st.subheader("🤖 AI-Powered Summary")
-        st.info("⚠️ AI feature is temporarily disabled.")
-
-        # col_ai1, col_ai2 = st.columns([4, 1])
-        # with col_ai1:
-        #     st.subheader("🤖 AI-Powered Summary")
-        # with col_ai2:
-        #     use_ai_summary = st.checkbox("Enable", value=True)
-
-        # if use_ai_summary and requests_with_issues:
-        #     with st.spinner("Analyzing with GPT..."):
-        #         try:
-        #             summary = summarize_issues(requests_with_issues)
-        #             st.markdown(summary)
-        #         except Exception as e:
-        #             st.error(f"❌ GPT summary failed: {e}")
-        # elif not requests_with_issues:
-        #     st.info("No issues found — nothing to summarize.")
-        # elif not use_ai_summary:
-        #     st.caption("💡 AI summary is disabled.")
+        col_ai1, col_ai2 = st.columns([4, 1])
+        with col_ai1:
+            st.subheader("🤖 AI-Powered Summary")
+        with col_ai2:
+            use_ai_summary = st.checkbox("Enable", value=False)
+
+        if use_ai_summary and not hits.empty:
+            model_choice = st.selectbox("Choose GPT Model", MODELS, index=0)
+            summary_backend = get_backend(model=model_choice, api_key=openai_api_key())
+            # Findings collapse to one line per (rule, endpoint), so the prompt stays small
+            findings = aggregate_findings(hits, df, plan=rule_plan)
+            summary_service = get_summary_service()
+            summary_key = summary_service.submit(findings, summary_backend)
+
+            try:
+                summary = summary_service.result(summary_key)
+            except Exception as e:
+                summary = None
+                st.error(f"❌ GPT summary failed: {e}")
+            else:
+                if summary is not None:
+                    st.markdown(summary)
+                else:
+                    # Poll in a fragment so only this block reruns while the worker thread finishes
+                    @st.fragment(run_every=SUMMARY_POLL_SECONDS)
+                    def summary_status():
+                        if summary_service.done(summary_key):
+                            st.rerun()
+                        st.info(f"⏳ Summarizing {findings['total_findings']} findings in "
+                                f"{len(findings['groups'])} groups...")
+
+                    summary_status()
+        elif use_ai_summary:
+            st.info("No issues found — nothing to summarize.")
+        else:
+            st.caption("💡 AI summary is disabled.")
 
     except Exception as e:
         st.error(f"❌ Error loading HAR file: {e}")
+    finally:
+        if recorder is not None:
+            recorder.stop()
+            if os.environ.get(TRACE_FILE_ENV):
+                recorder.export(os.environ[TRACE_FILE_ENV])
+            render_debug_panel(recorder)
 else:
     st.info("Please upload a `.har` file to begin.")
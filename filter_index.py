@@ -0,0 +1,185 @@
+"""
+Precomputed filter indexes over a request table, so a filter change in the
+dashboard is a few bitmap operations rather than string comparisons over
+every row.
+
+A `FilterIndex` is built once per capture. It keeps the integer codes of each
+filterable categorical column, a packed bitmap per value (built on first use),
+and a sorted index on the timing columns for threshold and range filters.
+`select` combines the filters into one bitmap. Counts, per-value totals and
+the largest rows of the filtered view come from that bitmap, the codes and
+the sorted indexes, so the DataFrame is never filtered or copied as a whole.
+`positions` gives the selected rows for the few places that need them.
+"""
+import numpy as np
+import pandas as pd
+
+# Categorical columns that can be filtered by value
+FILTER_COLUMNS = ['status_category', 'mime_group', 'domain', 'method']
+# Numeric columns that can be filtered by range
+RANGE_COLUMNS = ['time_ms', 'wait_time']
+
+# Set bits per byte value
+_POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype='uint8')
+
+
+class FilterIndex:
+    """Value bitmaps and sorted range indexes for one request table (see module docstring)."""
+
+    def __init__(self, df, columns=FILTER_COLUMNS, ranges=RANGE_COLUMNS):
+        self.size = len(df)
+        self.codes = {}
+        self.categories = {}
+        for column in columns:
+            if column not in df.columns:
+                continue
+            values = df[column] if isinstance(df[column].dtype, pd.CategoricalDtype) \
+                else df[column].astype('category')
+            self.codes[column] = values.cat.codes.to_numpy()
+            self.categories[column] = [str(value) for value in values.cat.categories]
+
+        # Rows ordered by value; NaN sorts last and never matches a range
+        self.sorted = {}
+        for column in ranges:
+            if column not in df.columns:
+                continue
+            values = df[column].to_numpy(dtype='float64')
+            order = np.argsort(values, kind='stable')
+            self.sorted[column] = (order, values[order])
+
+        self._bitmaps = {}
+        self._all = np.packbits(np.ones(self.size, dtype=bool))
+        self._options = {}
+        for column in self.codes:
+            counts = self.counts(column)
+            self._options[column] = counts[counts > 0].index.tolist()
+
+    @property
+    def nbytes(self):
+        """Memory held by the codes, sorted indexes and the bitmaps built so far."""
+        return int(sum(codes.nbytes for codes in self.codes.values()) +
+                   sum(order.nbytes + values.nbytes for order, values in self.sorted.values()) +
+                   sum(bits.nbytes for bits in self._bitmaps.values()) + self._all.nbytes)
+
+    def options(self, column):
+        """Values of `column` that occur in the table, most frequent first."""
+        return self._options[column]
+
+    def bitmap(self, column, value):
+        """Packed bitmap of the rows where `column` equals `value` (built once, then reused)."""
+        key = (column, value)
+        if key not in self._bitmaps:
+            categories = self.categories[column]
+            if value in categories:
+                self._bitmaps[key] = np.packbits(self.codes[column] == categories.index(value))
+            else:
+                self._bitmaps[key] = np.zeros_like(self._all)
+        return self._bitmaps[key]
+
+    def match(self, column, values):
+        """Rows whose `column` is any of `values`; None when that covers every row."""
+        values = set(values)
+        present = self._options[column]
+        if values.issuperset(present):
+            return None
+        # OR together whichever side of the selection is smaller
+        chosen = [value for value in present if value in values]
+        if len(chosen) <= len(present) - len(chosen):
+            bits = np.zeros_like(self._all)
+            for value in chosen:
+                bits |= self.bitmap(column, value)
+            return bits
+        excluded = np.zeros_like(self._all)
+        for value in present:
+            if value not in values:
+                excluded |= self.bitmap(column, value)
+        return self._all & ~excluded
+
+    def between(self, column, low=None, high=None):
+        """
+        Rows with `low <= column <= high` (either bound may be None), via the
+        sorted index; None when both bounds are None.
+        """
+        if low is None and high is None:
+            return None
+        order, values = self.sorted[column]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = np.searchsorted(values, np.inf, side='right') if high is None \
+            else np.searchsorted(values, high, side='right')
+        if start == 0 and end == self.size:
+            return None
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[start:end]] = True
+        return np.packbits(mask)
+
+    def select(self, values=None, ranges=None):
+        """
+        Intersects value filters (`{column: allowed values}`, None = any) and
+        range filters (`{column: (low, high)}`). Returns a packed bitmap, or
+        None when nothing is filtered out.
+        """
+        bits = None
+        parts = [self.match(column, allowed) for column, allowed in (values or {}).items()
+                 if allowed is not None and column in self.codes]
+        parts += [self.between(column, low, high) for column, (low, high) in (ranges or {}).items()
+                  if column in self.sorted]
+        for part in parts:
+            if part is not None:
+                bits = part.copy() if bits is None else np.bitwise_and(bits, part, out=bits)
+        return bits
+
+    def count(self, bits):
+        """Number of selected rows."""
+        if bits is None:
+            return self.size
+        # Padding bits past `size` are always zero, so the whole buffer can be counted
+        return int(_POPCOUNT[bits].sum(dtype='int64'))
+
+    def mask(self, bits):
+        """The selection as a boolean row mask."""
+        if bits is None:
+            return np.ones(self.size, dtype=bool)
+        return np.unpackbits(bits, count=self.size).view(bool)
+
+    def counts(self, column, bits=None):
+        """Rows per value of `column` within the selection, as a Series, most frequent first."""
+        codes = self.codes[column]
+        if bits is not None:
+            codes = codes[self.mask(bits)]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.categories[column]))
+        return pd.Series(counts, index=self.categories[column], name='count').sort_values(
+            ascending=False, kind='stable')
+
+    def totals(self, column, weights, bits=None):
+        """
+        Sum of `weights` (one value per row, e.g. `df['time_ms']`) per value of
+        `column` within the selection, as a Series, largest first. Values with
+        no selected rows are left out.
+        """
+        codes = self.codes[column]
+        weights = np.asarray(weights, dtype='float64')
+        keep = codes >= 0
+        if bits is not None:
+            keep &= self.mask(bits)
+        size = len(self.categories[column])
+        rows = np.bincount(codes[keep], minlength=size)
+        sums = np.bincount(codes[keep], weights=weights[keep], minlength=size)
+        present = rows > 0
+        return pd.Series(sums[present], index=np.array(self.categories[column], dtype=object)[present],
+                         name=column).sort_values(ascending=False, kind='stable')
+
+    def largest(self, column, n, bits=None):
+        """Positions of the `n` selected rows with the largest `column` values, largest first."""
+        order, values = self.sorted[column]
+        # Walk the sorted index from the top, skipping NaN, until n selected rows are found
+        valid = len(values) - int(np.isnan(values).sum())
+        candidates = order[:valid][::-1]
+        if bits is not None:
+            candidates = candidates[self.mask(bits)[candidates]]
+        return candidates[:n]
+
+    def positions(self, bits):
+        """Row positions of the selection in ascending order; None when nothing is filtered out."""
+        if bits is None:
+            return None
+        return np.flatnonzero(self.mask(bits))
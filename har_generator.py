@@ -0,0 +1,248 @@
+"""
+Synthetic HAR generator for benchmarks and load testing.
+
+    python har_generator.py synthetic.har --entries 100000 --seed 7
+
+Entries are written one at a time, so even 1M-entry captures are generated
+without holding the document in memory.
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+DOMAINS = [
+    ('acme.lightning.force.com', 0.45),
+    ('acme.my.salesforce.com', 0.15),
+    ('static.lightning.force.com', 0.15),
+    ('acme.file.force.com', 0.05),
+    ('cdn.salesforce.com', 0.08),
+    ('login.salesforce.com', 0.02),
+    ('www.google-analytics.com', 0.05),
+    ('fonts.gstatic.com', 0.05),
+]
+
+PATHS = {
+    'api': ['/aura', '/services/data/v59.0/query', '/services/data/v59.0/sobjects/Account/{id}',
+            '/services/data/v59.0/ui-api/records/{id}', '/webruntime/api/apex/execute'],
+    'static': ['/auraFW/javascript/{id}/aura_prod.js', '/resource/{id}/app.css',
+               '/_slds/icons/utility-sprite/svg/symbols.svg', '/img/logo_{id}.png',
+               '/fonts/salesforce-sans-{id}.woff2'],
+}
+
+MIME_TYPES = {
+    '.js': 'application/javascript',
+    '.css': 'text/css',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.woff2': 'font/woff2',
+}
+
+# (status, weight); 0 = aborted/blocked request as recorded by Chrome
+STATUS_MIX = [(200, 0.82), (204, 0.02), (304, 0.05), (301, 0.01), (302, 0.02),
+              (401, 0.01), (403, 0.01), (404, 0.02), (500, 0.015), (503, 0.01), (0, 0.005)]
+
+COMMON_HEADERS = ['Accept', 'Accept-Encoding', 'Accept-Language', 'Cache-Control', 'Connection',
+                  'Content-Type', 'Origin', 'Pragma', 'Sec-Fetch-Dest', 'Sec-Fetch-Mode',
+                  'Sec-Fetch-Site', 'User-Agent', 'X-SFDC-Request-Id', 'X-SFDC-Page-Scope-Id',
+                  'X-B3-TraceId', 'X-B3-SpanId', 'sec-ch-ua', 'sec-ch-ua-mobile', 'sec-ch-ua-platform']
+SENSITIVE = ['Authorization', 'Cookie', 'X-User-Id', 'Session-Id']
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _timing(rng, mean, missing_rate=0.0):
+    if rng.random() < missing_rate:
+        return -1
+    return round(rng.gammavariate(2.0, mean / 2.0), 3)
+
+
+def _initiator(rng, page_url, scripts):
+    """Chrome-style `_initiator`: the page's parser, or a call stack in a recently loaded script."""
+    if scripts and rng.random() < 0.6:
+        return {'type': 'script', 'stack': {'callFrames': [{
+            'functionName': '', 'url': rng.choice(scripts),
+            'lineNumber': rng.randrange(5000), 'columnNumber': rng.randrange(200)}]}}
+    return {'type': 'parser', 'url': page_url, 'lineNumber': rng.randrange(200)}
+
+
+def generate_entry(rng, started, page_url, ips, url=None, initiator=None):
+    """
+    One synthetic entry; `url` forces the request URL (e.g. to follow a
+    redirect or load a page), `initiator` sets Chrome's `_initiator` and an
+    empty `page_url` leaves out the Referer header.
+    """
+    url_forced = bool(url)
+    if url:
+        domain, path = url.split('/')[2], '/' + url.split('/', 3)[3]
+        is_static = False
+    else:
+        domain = _weighted(rng, DOMAINS)
+        is_static = domain.startswith(('static.', 'cdn.', 'fonts.')) or rng.random() < 0.25
+        # Static assets come from a small pool, so some are downloaded more than once
+        path = rng.choice(PATHS['static' if is_static else 'api']).format(
+            id=rng.randrange(300 if is_static else 10_000))
+        url = f"https://{domain}{path}"
+        if not is_static and rng.random() < 0.6:
+            url += f"?r={rng.randrange(1000)}&other.{rng.choice(['Record', 'List', 'Apex'])}=1"
+
+    # Navigations and redirect follow-ups are always GETs
+    method = 'GET' if is_static or url_forced or rng.random() < 0.55 else 'POST'
+    status = _weighted(rng, STATUS_MIX)
+    extension = next((ext for ext in MIME_TYPES if path.endswith(ext)), None)
+    mime_type = MIME_TYPES[extension] if extension else rng.choice(['application/json', 'application/json',
+                                                                    'text/html', 'text/plain'])
+
+    # A fresh connection pays dns/connect/ssl; reused ones record -1 (or 0)
+    new_connection = rng.random() < 0.15
+    blocked = _timing(rng, 4, missing_rate=0.1)
+    dns = _timing(rng, 25 if rng.random() < 0.97 else 450) if new_connection else -1
+    connect = _timing(rng, 60 if rng.random() < 0.97 else 700) if new_connection else -1
+    ssl = round(connect * 0.6, 3) if new_connection else -1
+    send = _timing(rng, 0.5)
+    wait = _timing(rng, 80 if is_static else (220 if rng.random() < 0.9 else 1400))
+    receive = _timing(rng, 15)
+    total = sum(max(0, t) for t in (blocked, dns, connect, send, wait, receive))
+
+    body_size = -1 if status == 0 else int(rng.lognormvariate(8.5, 1.6))
+    if rng.random() < 0.003:
+        body_size = rng.randrange(1_100_000, 6_000_000)
+
+    # Most text responses are compressed on the wire; fonts and images are not
+    compressible = mime_type.startswith(('text/', 'application/', 'image/svg'))
+    encoding = rng.choice(['gzip', 'br']) if compressible and body_size > 1024 and rng.random() < 0.8 else ''
+    wire_size = int(body_size * rng.uniform(0.2, 0.35)) if encoding else body_size
+    from_cache = rng.choice(['memory', 'disk']) if is_static and status == 200 and rng.random() < 0.2 else ''
+    if from_cache:
+        wire_size = 0
+
+    headers = [{'name': name, 'value': f"value-{rng.randrange(1_000_000)}"}
+               for name in rng.sample(COMMON_HEADERS, rng.randint(4, len(COMMON_HEADERS)))]
+    headers += [{'name': f"X-Custom-{i}", 'value': 'x' * rng.randint(4, 64)} for i in range(rng.randint(0, 25))]
+    headers += [{'name': name, 'value': f"secret-{rng.randrange(10 ** 9)}"}
+                for name in SENSITIVE if rng.random() < 0.3]
+    if page_url:
+        headers.append({'name': 'Referer', 'value': page_url})
+    rng.shuffle(headers)
+
+    response_headers = [{'name': 'content-type', 'value': mime_type}]
+    if encoding:
+        response_headers.append({'name': 'content-encoding', 'value': encoding})
+    cache_control = rng.choice(['public, max-age=31536000, immutable'] * 3 + ['no-cache', 'max-age=300']) \
+        if is_static else rng.choice(['no-cache, no-store, must-revalidate', 'private, max-age=0'])
+    response_headers.append({'name': 'cache-control', 'value': cache_control})
+    redirect_url = ''
+    if status in (301, 302):
+        redirect_url = f"https://{domain}/lightning/r/{rng.randrange(10_000)}/view"
+        response_headers.append({'name': 'location', 'value': redirect_url})
+
+    return {
+        'startedDateTime': started.isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        'time': round(total, 3),
+        'request': {
+            'method': method,
+            'url': url,
+            'httpVersion': 'h2',
+            'headers': headers,
+            'queryString': [],
+            'cookies': [],
+            'headersSize': -1,
+            'bodySize': 0 if method == 'GET' else rng.randrange(200, 20_000),
+        },
+        'response': {
+            'status': status,
+            'statusText': '',
+            'httpVersion': 'h2',
+            'headers': response_headers,
+            'cookies': [],
+            'content': {'size': max(body_size, 0), 'compression': max(body_size - wire_size, 0) if encoding else 0,
+                        'mimeType': mime_type},
+            'redirectURL': redirect_url,
+            'headersSize': -1,
+            'bodySize': wire_size,
+            '_transferSize': max(wire_size, 0) + 300 if not from_cache else 0,
+        },
+        'cache': {},
+        'timings': {
+            'blocked': blocked, 'dns': dns, 'connect': connect, 'ssl': ssl,
+            'send': send, 'wait': wait, 'receive': receive,
+        },
+        'serverIPAddress': ips.setdefault(domain, f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"),
+        'connection': str(rng.randrange(1, 200)),
+        '_priority': rng.choice(['VeryHigh', 'High', 'Medium', 'Low']),
+        **({'_initiator': initiator} if initiator else {}),
+        **({'_fromCache': from_cache} if from_cache else {}),
+    }
+
+
+def generate_entries(n_entries, seed=0):
+    """
+    Yields `n_entries` synthetic HAR entries with increasing start times. The
+    capture opens with a page load and navigates now and then after a pause.
+    Other requests are initiated by the current page or by one of its recently
+    loaded scripts, so initiator chains (page -> script -> request) are several
+    hops deep.
+    """
+    rng = random.Random(seed)
+    started = datetime(2025, 5, 1, 12, 0, 0, tzinfo=timezone.utc)
+    page_url = 'https://acme.lightning.force.com/lightning/page/home'
+    ips = {}
+    scripts = []
+    redirect_url = None
+    navigate = True
+    for _ in range(n_entries):
+        # Bursty arrivals: most requests start within a few ms of the previous one
+        pause = rng.random() >= 0.95
+        started += timedelta(milliseconds=rng.uniform(200, 3000) if pause else rng.expovariate(1 / 8))
+        if pause and not redirect_url and rng.random() < 0.3:
+            navigate = True
+        if navigate:
+            # The document request every parser-initiated request on the page points back to.
+            # Navigations carry no referer, so each page load starts its own dependency chain
+            page_url = f"https://acme.lightning.force.com/lightning/r/{rng.randrange(10_000)}/view"
+            scripts = []
+            entry = generate_entry(rng, started, '', ips, url=page_url)
+            navigate = False
+        else:
+            # A 3xx is followed by the request to its Location, so captures contain real redirect chains
+            entry = generate_entry(rng, started, page_url, ips, url=redirect_url,
+                                   initiator=_initiator(rng, page_url, scripts))
+        redirect_url = entry['response']['redirectURL'] or None
+        if entry['request']['url'].endswith('.js'):
+            scripts = (scripts + [entry['request']['url']])[-16:]
+        yield entry
+
+
+def generate_har(n_entries, seed=0):
+    """Builds a complete HAR document in memory (convenient for small captures)."""
+    return {'log': {'version': '1.2', 'creator': {'name': 'har_generator', 'version': '1.0'},
+                    'entries': list(generate_entries(n_entries, seed))}}
+
+
+def write_har(path, n_entries, seed=0):
+    """Streams a synthetic HAR with `n_entries` entries to `path`."""
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('{"log": {"version": "1.2", "creator": {"name": "har_generator", "version": "1.0"}, '
+                   '"pages": [], "entries": [\n')
+        for i, entry in enumerate(generate_entries(n_entries, seed)):
+            if i:
+                file.write(',\n')
+            file.write(json.dumps(entry))
+        file.write('\n]}}\n')
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic HAR file.")
+    parser.add_argument('output', help="path of the .har file to write")
+    parser.add_argument('-n', '--entries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    write_har(args.output, args.entries, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,35 @@
+import hashlib
+import io
 import json
 import os
+import sys
+from array import array
+from functools import lru_cache
 
-SENSITIVE_HEADERS = ['authorization', 'cookie', 'set-cookie', 'x-user-id', 'email', 'session-id']
+import numpy as np
+import pandas as pd
 
+from instrumentation import stage, timed, timed_iter
+
+SENSITIVE_HEADERS = frozenset(['authorization', 'cookie', 'set-cookie', 'x-user-id', 'email', 'session-id'])
+REDACTED = '[REDACTED]'
+
+# Request headers copied into their own table column, keyed by lowercase name
+REQUEST_HEADER_COLUMNS = {'referer': 'referer'}
+# Response headers copied into their own table column, keyed by lowercase name
+RESPONSE_HEADER_COLUMNS = {'content-encoding': 'content_encoding', 'cache-control': 'cache_control'}
+# Response headers read while parsing; Location only feeds redirect_url
+_RESPONSE_HEADERS = frozenset(RESPONSE_HEADER_COLUMNS) | {'location'}
+
+# Size of each read from the underlying file while streaming entries
+STREAM_CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]}'
+_decoder = json.JSONDecoder()
+
+
+@timed('parse.load_har_file')
 def load_har_file(filepath):
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"File not found: {filepath}")
@@ -13,66 +40,538 @@ def load_har_file(filepath):
             raise ValueError("HAR file is empty.")
         return json.loads(contents)
 
+
+class _EntryStream:
+    """
+    Minimal incremental JSON reader that walks a HAR document and yields
+    `log.entries` one object at a time. Only the current entry (plus a small
+    read buffer) is held in memory; every other top-level value is decoded
+    and discarded as it is passed.
+    """
+
+    def __init__(self, file, chunk_size=STREAM_CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, min_size=0):
+        if self.eof:
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.file.read(max(self.chunk_size, min_size))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"Malformed HAR file: expected '{char}' but found '{found or 'end of file'}'.")
+        self.pos += 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Value straddles the buffer boundary; grow the read size with the
+                # pending value so very large entries are not re-scanned quadratically
+                if not self._fill(len(self.buf) - self.pos):
+                    raise ValueError("Malformed HAR file: unexpected end of file.")
+                continue
+            # A bare number cut by the buffer end (e.g. "1." of "1.5") may still
+            # continue in the next chunk, so only accept it once a delimiter follows
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and (end == len(self.buf) or self.buf[end] not in _DELIMITERS)
+                    and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+    def _members(self):
+        """Yields the keys of the object at the cursor, leaving the cursor on each value."""
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            yield key
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._expect('}')
+            return
+
+    def _items(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._peek() == ',':
+                self.pos += 1
+                continue
+            self._expect(']')
+            return
+
+    def entries(self):
+        if self._peek() == '\ufeff':
+            # Text streams opened without utf-8-sig keep the byte order mark
+            self.pos += 1
+        if not self._peek():
+            raise ValueError("HAR file is empty.")
+        for key in self._members():
+            if key != 'log' or self._peek() != '{':
+                self._value()
+                continue
+            for log_key in self._members():
+                if log_key == 'entries' and self._peek() == '[':
+                    yield from self._items()
+                else:
+                    self._value()
+
+
+def _decoded(binary):
+    """
+    Text view of a binary HAR stream. The encoding (UTF-8 with or without a
+    BOM, UTF-16 or UTF-32) is detected from the first bytes, as `json.loads`
+    does for bytes.
+    """
+    encoding = 'utf-8-sig'
+    if hasattr(binary, 'seek'):
+        start = binary.tell()
+        encoding = json.detect_encoding(binary.read(4))
+        binary.seek(start)
+    return io.TextIOWrapper(binary, encoding=encoding)
+
+
+def iter_har_entries(source):
+    """
+    Streams raw HAR entries from a file path or an open file object (text or
+    binary, e.g. a Streamlit upload) without loading the whole document.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"File not found: {source}")
+        with open(source, 'rb') as file, _decoded(file) as text:
+            yield from _EntryStream(text).entries()
+        return
+
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    if isinstance(source, io.TextIOBase):
+        yield from _EntryStream(source).entries()
+        return
+
+    # Decode incrementally so multi-byte characters split across chunks survive
+    text = _decoded(source)
+    try:
+        yield from _EntryStream(text).entries()
+    finally:
+        # Hand the buffer back so the caller's file object is not closed with the wrapper
+        text.detach()
+
+
+class HeaderMatcher:
+    """
+    Precompiled header-name classifier. Each distinct header name is lowercased
+    and checked against the sensitive and wanted sets once, then remembered, so
+    scanning a header list is a dict lookup per header.
+    """
+
+    MAX_CACHED_NAMES = 4096
+
+    def __init__(self, wanted=()):
+        self.wanted = frozenset(wanted)
+        self._kinds = {}
+
+    def _classify(self, name):
+        # None for headers that need no work, else (is_sensitive, wanted_key or None)
+        lower = name.lower()
+        kind = (lower in SENSITIVE_HEADERS, lower if lower in self.wanted else None)
+        if kind == (False, None):
+            kind = None
+        if len(self._kinds) < self.MAX_CACHED_NAMES:
+            self._kinds[name] = kind
+        return kind
+
+    def kind(self, name):
+        kinds = self._kinds
+        return kinds[name] if name in kinds else self._classify(name)
+
+    def is_sensitive(self, name):
+        kind = self.kind(name)
+        return kind is not None and kind[0]
+
+    def scan(self, headers):
+        """Redacts and extracts in one pass; returns `(pairs, found)`."""
+        kinds = self._kinds
+        pairs = []
+        found = {}
+        for h in headers:
+            name = h.get('name', '')
+            value = h.get('value', '')
+            kind = kinds[name] if name in kinds else self._classify(name)
+            if kind is not None:
+                if kind[0]:
+                    value = REDACTED
+                if kind[1] and kind[1] not in found:
+                    found[kind[1]] = value
+            pairs.append((name, value))
+        return tuple(pairs), found
+
+    def find(self, headers):
+        """Collects only the wanted values (redacted if sensitive), leaving `headers` untouched."""
+        kinds = self._kinds
+        found = {}
+        for h in headers:
+            name = h.get('name', '')
+            kind = kinds[name] if name in kinds else self._classify(name)
+            if kind is not None and kind[1] and kind[1] not in found:
+                found[kind[1]] = REDACTED if kind[0] else h.get('value', '')
+        return found
+
+
+@lru_cache(maxsize=32)
+def _matcher(wanted):
+    return HeaderMatcher(wanted)
+
+
 def sanitize_headers(headers):
+    matcher = _matcher(frozenset())
     return [
-        {**h, 'value': '[REDACTED]'} if h.get('name', '').lower() in SENSITIVE_HEADERS else h
+        {**h, 'value': REDACTED} if matcher.is_sensitive(h.get('name', '')) else h
         for h in headers
     ]
 
+
+def scan_headers(headers, wanted=()):
+    """
+    Single pass over a HAR header list: redacts sensitive values and picks out
+    the first value of each header in `wanted` (lowercase names). Returns
+    `(pairs, found)` where `pairs` is a tuple of (name, value) tuples.
+    """
+    return _matcher(frozenset(wanted)).scan(headers)
+
+
+def find_headers(headers, wanted):
+    """Like `scan_headers` but only collects `wanted` values, leaving the list untouched."""
+    return _matcher(frozenset(wanted)).find(headers)
+
+
+def extract_request(entry):
+    """
+    One HAR entry as a record dict: the request table's columns (read by
+    `_read_entry`, exactly as `build_request_table` fills them) plus the
+    redacted request headers and the raw cache object.
+    """
+    numbers, texts, start_time, pairs = _read_entry(entry, _request_matcher(), _response_matcher(), True)
+    record = dict(zip(NUMERIC_COLUMNS, numbers))
+    record.update(zip(CATEGORICAL_COLUMNS, texts))
+    record['start_time'] = start_time
+    record['request_headers'] = [{'name': name, 'value': value} for name, value in pairs]
+    record['startedDateTime'] = start_time
+    record['cache'] = entry.get('cache', {})
+    return record
+
+
 def extract_requests(har_data):
     entries = har_data.get('log', {}).get('entries', [])
-    requests = []
-
-    for entry in entries:
-        request = entry.get('request', {})
-        response = entry.get('response', {})
-        timings = entry.get('timings', {})
-        content = response.get('content', {})
-        headers = sanitize_headers(request.get('headers', []))
-        cache = entry.get('cache', {})
-
-        # Extract values safely
-        url = request.get('url', '')
-        method = request.get('method', '')
-        status = response.get('status', 0)
-        start_time = entry.get('startedDateTime', '')
-        mime_type = content.get('mimeType', '')
-        response_size = response.get('bodySize', -1)  # -1 = unknown
-        time_ms = entry.get('time', 0)
-
-        # Timing breakdown (can be -1 if not captured)
-        wait_time = timings.get('wait', -1)
-        blocked_time = timings.get('blocked', -1)
-        connect_time = timings.get('connect', -1)
-        dns_time = timings.get('dns', -1)
-        ssl_time = timings.get('ssl', -1)
-        redirect_time = timings.get('redirect', -1)
-
-        # Extra metadata
-        server_ip = entry.get('serverIPAddress', '')
-        priority = entry.get('_priority', '')  # Chrome-only
-        referer = next((h['value'] for h in headers if h.get('name', '').lower() == 'referer'), '')
-
-        requests.append({
-            'url': url,
-            'method': method,
-            'status': status,
-            'start_time': start_time,
-            'time_ms': time_ms,
-            'mime_type': mime_type,
-            'response_size': response_size,
-            'wait_time': wait_time,
-            'blocked_time': blocked_time,
-            'connect_time': connect_time,
-            'dns_time': dns_time,
-            'ssl_time': ssl_time,
-            'redirect_time': redirect_time,
-            'server_ip': server_ip,
-            'priority': priority,
-            'referer': referer,
-            'request_headers': headers,
-            "startedDateTime": start_time,
-            'cache': cache,
-        })
-
-    return requests
\ No newline at end of file
+    with stage('parse.extract_requests', entries=len(entries)):
+        return [extract_request(entry) for entry in entries]
+
+
+def iter_requests(source):
+    """
+    Streaming counterpart of `load_har_file` + `extract_requests`: yields one
+    extracted request record per HAR entry, so peak memory is bounded by a
+    single entry plus whatever the caller keeps.
+    """
+    for entry in iter_har_entries(source):
+        yield extract_request(entry)
+
+
+# Column layout of the request table built by `build_request_table`, in the order `_read_entry` returns them
+NUMERIC_COLUMNS = {
+    'status': 'int32',
+    'time_ms': 'float64',
+    'response_size': 'int64',
+    'content_size': 'int64',
+    'compression': 'int64',
+    'transfer_size': 'int64',
+    'wait_time': 'float64',
+    'blocked_time': 'float64',
+    'connect_time': 'float64',
+    'dns_time': 'float64',
+    'ssl_time': 'float64',
+    'redirect_time': 'float64',
+    'receive_time': 'float64',
+}
+CATEGORICAL_COLUMNS = ['url', 'method', 'mime_type', 'server_ip', 'connection', 'priority',
+                       *REQUEST_HEADER_COLUMNS.values(), 'initiator', 'redirect_url',
+                       *RESPONSE_HEADER_COLUMNS.values(), 'cache_state', 'body_hash']
+
+
+class HeaderTable:
+    """
+    Side table holding each request's headers, keyed by row position in the
+    request table. Headers are stored already redacted and in columnar form:
+    per-row offsets into flat arrays of name and value codes, with every
+    distinct name and value kept once. Repeated headers (user agent, accept,
+    cookies redacted to one marker) therefore cost two ints each rather than
+    two strings and a tuple; rows are only turned back into pairs when read.
+    """
+
+    def __init__(self):
+        self._offsets = array('q', [0])
+        self._name_codes = array('i')
+        self._value_codes = array('i')
+        self._names = []
+        self._name_index = {}
+        self._values = []
+        self._value_index = {}
+
+    def append(self, headers):
+        """Stores one row of redacted (name, value) pairs from `scan_headers`."""
+        name_index, value_index = self._name_index, self._value_index
+        name_codes, value_codes = self._name_codes, self._value_codes
+        for name, value in headers:
+            code = name_index.get(name)
+            if code is None:
+                code = name_index[name] = len(self._names)
+                self._names.append(name)
+            name_codes.append(code)
+            code = value_index.get(value)
+            if code is None:
+                code = value_index[value] = len(self._values)
+                self._values.append(value)
+            value_codes.append(code)
+        self._offsets.append(len(name_codes))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def pairs(self, row):
+        """Redacted (name, value) tuples for one row."""
+        if row < 0:
+            row += len(self)
+        start, end = self._offsets[row], self._offsets[row + 1]
+        names, values = self._names, self._values
+        return tuple((names[name], values[value]) for name, value in
+                     zip(self._name_codes[start:end], self._value_codes[start:end]))
+
+    def __getitem__(self, row):
+        return [{'name': name, 'value': value} for name, value in self.pairs(row)]
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the stored headers."""
+        total = sum(codes.itemsize * len(codes) for codes in (self._offsets, self._name_codes, self._value_codes))
+        for strings, index in ((self._names, self._name_index), (self._values, self._value_index)):
+            total += sys.getsizeof(strings) + sys.getsizeof(index) + sum(sys.getsizeof(text) for text in strings)
+        return total
+
+
+def _number(value, default):
+    return default if value is None else value
+
+
+def _text(value, default):
+    # HAR exporters write null for absent strings; numbers show up in string fields too
+    if value is None:
+        return default
+    return value if isinstance(value, str) else str(value)
+
+
+def _initiator_url(entry):
+    # Chrome-only: the document or script that triggered the request
+    initiator = entry.get('_initiator')
+    if not isinstance(initiator, dict):
+        return ''
+    if initiator.get('url'):
+        return initiator['url']
+    frames = (initiator.get('stack') or {}).get('callFrames') or []
+    return next((frame['url'] for frame in frames if frame.get('url')), '')
+
+
+def _redirect_target(response, response_headers):
+    # redirectURL is often empty even on 3xx; the Location header is the fallback
+    return response.get('redirectURL') or response_headers.get('location', '')
+
+
+def _cache_state(entry):
+    # Chrome records cache hits as _fromCache ('memory'/'disk'); HAR 1.2 as cache.beforeRequest
+    if entry.get('_fromCache'):
+        return entry['_fromCache']
+    return 'cached' if (entry.get('cache') or {}).get('beforeRequest') else ''
+
+
+def _body_hash(content):
+    # Only present when the capture was saved with content; identifies identical bodies
+    text = content.get('text')
+    if not text:
+        return ''
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _domain_of(url):
+    return url.split('/')[2] if '//' in url else 'unknown'
+
+
+def _request_matcher():
+    return _matcher(frozenset(REQUEST_HEADER_COLUMNS))
+
+
+def _response_matcher():
+    return _matcher(_RESPONSE_HEADERS)
+
+
+def _read_entry(entry, matcher, response_matcher, keep_headers):
+    """
+    The single place a HAR entry is read. Returns `(numbers, texts, start_time,
+    header_pairs)`, with `numbers` in `NUMERIC_COLUMNS` order and `texts` in
+    `CATEGORICAL_COLUMNS` order; nulls are already replaced by each column's
+    default. `header_pairs` is None unless `keep_headers`.
+    """
+    request = entry.get('request') or {}
+    response = entry.get('response') or {}
+    timings = entry.get('timings') or {}
+    content = response.get('content') or {}
+    raw_headers = request.get('headers') or []
+    if keep_headers:
+        pairs, wanted = matcher.scan(raw_headers)
+    else:
+        pairs, wanted = None, matcher.find(raw_headers)
+    response_headers = response_matcher.find(response.get('headers') or [])
+    status = _number(response.get('status'), 0)
+    intern = sys.intern
+
+    numbers = (
+        status,
+        _number(entry.get('time'), 0),
+        _number(response.get('bodySize'), -1),  # -1 = unknown
+        _number(content.get('size'), -1),  # decoded size
+        _number(content.get('compression'), -1),  # bytes saved by content-encoding
+        _number(response.get('_transferSize'), -1),  # Chrome-only, headers + body on the wire
+        # Timing breakdown (-1 if not captured)
+        _number(timings.get('wait'), -1),
+        _number(timings.get('blocked'), -1),
+        _number(timings.get('connect'), -1),
+        _number(timings.get('dns'), -1),
+        _number(timings.get('ssl'), -1),
+        _number(timings.get('redirect'), -1),
+        _number(timings.get('receive'), -1),
+    )
+    texts = (
+        _text(request.get('url'), ''),
+        intern(_text(request.get('method'), '')),
+        intern(_text(content.get('mimeType'), '')),
+        intern(_text(entry.get('serverIPAddress'), '')),
+        _text(entry.get('connection'), ''),  # socket/stream id, when recorded
+        intern(_text(entry.get('_priority'), '')),  # Chrome-only
+        *[wanted.get(name, '') for name in REQUEST_HEADER_COLUMNS],
+        _initiator_url(entry),
+        # Only redirects carry a target worth keeping
+        _redirect_target(response, response_headers) if 300 <= status < 400 else '',
+        *[response_headers.get(name, '') for name in RESPONSE_HEADER_COLUMNS],
+        _cache_state(entry),
+        _body_hash(content),
+    )
+    return numbers, texts, _text(entry.get('startedDateTime'), ''), pairs
+
+
+def build_request_table(entries, keep_headers=True):
+    """
+    Fills typed columns straight from HAR entries (no per-entry record dicts)
+    and returns `(df, headers)`: a DataFrame with numeric timing/status/size
+    arrays and categorical url, method, mime and domain columns, plus a
+    `HeaderTable` with the request headers. Callers that never show headers
+    pass `keep_headers=False` to skip storing them; `headers` is then None.
+    """
+    numeric = [array('d') for _ in NUMERIC_COLUMNS]
+    text = [[] for _ in CATEGORICAL_COLUMNS]
+    start_times = []
+    headers = HeaderTable() if keep_headers else None
+    matcher, response_matcher = _request_matcher(), _response_matcher()
+    append_number = [column.append for column in numeric]
+    append_text = [column.append for column in text]
+
+    # Entries are decoded lazily as the loop pulls them; the decode span counts only that time
+    for entry in timed_iter(entries, 'parse.decode_entries'):
+        numbers, texts, start_time, pairs = _read_entry(entry, matcher, response_matcher, keep_headers)
+        for append, value in zip(append_number, numbers):
+            append(value)
+        for append, value in zip(append_text, texts):
+            append(value)
+        start_times.append(start_time)
+        if headers is not None:
+            headers.append(pairs)
+
+    with stage('parse.dataframe', entries=len(start_times)):
+        columns = {}
+        for (name, dtype), values in zip(NUMERIC_COLUMNS.items(), numeric):
+            columns[name] = np.frombuffer(values, dtype='float64').astype(dtype)
+        for name, values in zip(CATEGORICAL_COLUMNS, text):
+            columns[name] = pd.Categorical(values)
+        columns['start_time'] = np.array(start_times, dtype=object)
+        df = pd.DataFrame(columns)
+
+    with stage('parse.derived_columns', entries=len(df)):
+        add_derived_columns(df)
+    return df, headers
+
+
+def _map_categories(values, func):
+    """Applies `func` once per distinct value and returns the mapped column as a categorical."""
+    values = pd.Categorical(values)
+    mapped = pd.Categorical([func(v) for v in values.categories])
+    # Missing values (code -1) stay missing instead of indexing the last category
+    codes = np.where(values.codes >= 0, mapped.codes[values.codes], -1) if len(mapped.codes) \
+        else np.full(len(values), -1, dtype='int8')
+    return pd.Categorical.from_codes(codes, mapped.categories)
+
+
+def add_derived_columns(df):
+    """
+    Adds the domain, status_category and mime_group columns, each computed
+    once per distinct value rather than once per row, and `start_ms`, the
+    parsed start time in epoch milliseconds.
+    """
+    df['domain'] = _map_categories(df['url'], _domain_of)
+    df['status_category'] = _map_categories(df['status'], lambda s: f"{s // 100}xx")
+    df['mime_group'] = _map_categories(df['mime_type'], lambda m: m.split('/')[0])
+    df['start_ms'] = parse_start_times(df['start_time'])
+    return df
+
+
+def parse_start_times(start_times):
+    """Parses ISO-8601 `startedDateTime` strings into epoch milliseconds (NaN if unparseable)."""
+    parsed = pd.to_datetime(pd.Series(start_times), utc=True, format='ISO8601', errors='coerce')
+    return ((parsed - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(milliseconds=1)).to_numpy(dtype='float64')
+
+
+def load_request_table(source, keep_headers=True):
+    """Streams a HAR file path or upload straight into the columnar request table."""
+    with stage('parse.load_request_table') as span:
+        df, headers = build_request_table(iter_har_entries(source), keep_headers=keep_headers)
+        span.entries = len(df)
+    return df, headers
@@ -0,0 +1,362 @@
+"""
+Lightweight stage timing for the parse → analyze → render pipeline.
+
+Code marks its hot stages with `stage(...)` blocks or the `timed` decorator.
+Nothing is measured unless a `Recorder` is active in the current context
+(`with record() as recorder:`). Otherwise a stage costs one context-variable
+lookup. Each span keeps its wall time, the entries it processed and the
+change in process memory. Recorders export as plain JSON or as
+OpenTelemetry-style (OTLP/JSON) spans appended to a local file.
+
+`record(profile='cprofile' | 'tracemalloc')` also captures a profile of the
+whole run for deeper dives.
+"""
+import functools
+import io
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Set to show the debug panel (stage timings, exports, profiling) in the dashboard
+DEBUG_ENV = 'HAR_ANALYZER_DEBUG'
+# When set, every recorded dashboard run is appended to this file as OTLP/JSON spans
+TRACE_FILE_ENV = 'HAR_ANALYZER_TRACE_FILE'
+PROFILE_MODES = ['cprofile', 'tracemalloc']
+# Lines kept from a cProfile / tracemalloc report
+PROFILE_TOP = 30
+
+SPAN_COLUMNS = ['name', 'parent', 'depth', 'start_ms', 'duration_ms', 'entries', 'memory_delta_mb']
+
+_recorder = ContextVar('har_analyzer_recorder', default=None)
+_parent = ContextVar('har_analyzer_span', default=None)
+
+
+def debug_enabled():
+    return os.environ.get(DEBUG_ENV, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+def _memory_bytes():
+    """Traced Python memory while tracemalloc runs, else the process's resident set size."""
+    if 'tracemalloc' in sys.modules and sys.modules['tracemalloc'].is_tracing():
+        return sys.modules['tracemalloc'].get_traced_memory()[0]
+    try:
+        with open('/proc/self/statm', 'rb') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # No procfs (e.g. macOS): fall back to peak RSS, which only ever grows
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Span:
+    """One timed stage. Set `entries` inside the block when the count is only known afterwards."""
+
+    __slots__ = ('recorder', 'name', 'span_id', 'parent_id', 'depth', 'entries', 'attributes',
+                 'start_ns', 'end_ns', 'memory_delta', '_clock', '_memory', '_token')
+
+    def __init__(self, recorder, name, parent, entries=None, attributes=None):
+        self.recorder = recorder
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.entries = entries
+        self.attributes = attributes or {}
+        self.start_ns = self.end_ns = 0
+        self.memory_delta = 0
+
+    def __enter__(self):
+        self._token = _parent.set(self)
+        self._memory = _memory_bytes()
+        self.start_ns = time.time_ns()
+        self._clock = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter_ns() - self._clock
+        self.end_ns = self.start_ns + elapsed
+        self.memory_delta = _memory_bytes() - self._memory
+        _parent.reset(self._token)
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self.recorder.add(self)
+        return False
+
+    @property
+    def duration_ms(self):
+        return (self.end_ns - self.start_ns) / 1e6
+
+
+class _NullSpan:
+    """Stand-in returned while nothing is recording; every write is dropped."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def stage(name, entries=None, **attributes):
+    """Context manager timing `name` when a recorder is active; a no-op otherwise."""
+    recorder = _recorder.get()
+    if recorder is None:
+        return _NULL_SPAN
+    return recorder.span(name, entries, attributes)
+
+
+def lap(name, entries=None):
+    """
+    Ends the previous lap and starts timing `name`, for long linear scripts
+    (like the dashboard) where nesting every section in a `with` block would
+    not fit. A no-op when nothing is recording.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        return _NULL_SPAN
+    return recorder.lap(name, entries)
+
+
+def table_rows(df, *args, **kwargs):
+    """`entries` callback for `timed`: the row count of the first argument."""
+    return len(df)
+
+
+def timed(name, entries=None):
+    """Decorator form of `stage`; `entries` is called with the function's arguments."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _recorder.get()
+            if recorder is None:
+                return func(*args, **kwargs)
+            with recorder.span(name, entries(*args, **kwargs) if entries else None, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def timed_iter(iterable, name):
+    """
+    Yields from `iterable`, recording the time spent producing items (not
+    consuming them) as one `name` span with the item count. Useful when
+    decoding and processing are interleaved, as in the streaming parser.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        yield from iterable
+        return
+
+    parent = _parent.get()
+    span = Span(recorder, name, parent)
+    span.start_ns = time.time_ns()
+    iterator = iter(iterable)
+    count = 0
+    spent = 0
+    clock = time.perf_counter_ns
+    try:
+        while True:
+            started = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                spent += clock() - started
+                break
+            spent += clock() - started
+            count += 1
+            yield item
+    finally:
+        span.end_ns = span.start_ns + spent
+        span.entries = count
+        span.attributes['interleaved'] = True
+        recorder.add(span)
+
+
+class Recorder:
+    """Collects the spans of one run, in the order they finished."""
+
+    def __init__(self, name='har-analyzer'):
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self.profile = None
+        self._lock = threading.Lock()
+        self._lap = None
+        self._token = None
+        self._profiler = None
+        self._profile_mode = None
+        self._started_tracing = False
+
+    def span(self, name, entries=None, attributes=None):
+        return Span(self, name, _parent.get(), entries, attributes)
+
+    def lap(self, name, entries=None):
+        """Ends the current lap span, if any, and starts `name` as the next one."""
+        self.end_lap()
+        self._lap = self.span(name, entries, {}).__enter__()
+        return self._lap
+
+    def end_lap(self, error=None):
+        if self._lap is not None:
+            lap, self._lap = self._lap, None
+            lap.__exit__(type(error) if error else None, error, None)
+
+    def start(self, profile=None):
+        """Makes this the active recorder for the current context, optionally profiling until `stop`."""
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {profile} (expected one of {', '.join(PROFILE_MODES)})")
+        self._token = _recorder.set(self)
+        self._profile_mode = profile
+        if profile == 'cprofile':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif profile == 'tracemalloc':
+            import tracemalloc
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        return self
+
+    def stop(self, error=None):
+        """Closes any open lap, deactivates the recorder and collects the profile report."""
+        if self._token is None:
+            return self
+        self.end_lap(error)
+        _recorder.reset(self._token)
+        self._token = None
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.profile = _cprofile_report(self._profiler)
+            self._profiler = None
+        elif self._profile_mode == 'tracemalloc':
+            import tracemalloc
+            self.profile = _tracemalloc_report(tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()[1])
+            if self._started_tracing:
+                tracemalloc.stop()
+        return self
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def records(self):
+        """Spans as plain dicts, ordered by start time, with offsets relative to the first span."""
+        spans = sorted(self.spans, key=lambda span: span.start_ns)
+        origin = spans[0].start_ns if spans else 0
+        names = {span.span_id: span.name for span in spans}
+        return [{
+            'name': span.name,
+            'parent': names.get(span.parent_id),
+            'depth': span.depth,
+            'start_ms': round((span.start_ns - origin) / 1e6, 3),
+            'duration_ms': round(span.duration_ms, 3),
+            'entries': span.entries,
+            'memory_delta_mb': round(span.memory_delta / (1024 * 1024), 2),
+            **({'attributes': span.attributes} if span.attributes else {}),
+        } for span in spans]
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.records(), columns=SPAN_COLUMNS)
+
+    def to_dict(self):
+        roots = [span for span in self.spans if span.parent_id is None]
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'total_ms': round(sum(span.duration_ms for span in roots), 3),
+            'spans': self.records(),
+            'profile': self.profile,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_otel(self, service_name='har-analyzer'):
+        """The spans as an OTLP/JSON `ExportTraceServiceRequest` document."""
+        def attribute(key, value):
+            if isinstance(value, bool):
+                return {'key': key, 'value': {'boolValue': value}}
+            if isinstance(value, int):
+                return {'key': key, 'value': {'intValue': str(value)}}
+            if isinstance(value, float):
+                return {'key': key, 'value': {'doubleValue': value}}
+            return {'key': key, 'value': {'stringValue': str(value)}}
+
+        spans = []
+        for span in self.spans:
+            attributes = [attribute('memory.delta_bytes', int(span.memory_delta))]
+            if span.entries is not None:
+                attributes.append(attribute('entries', int(span.entries)))
+            attributes += [attribute(key, value) for key, value in span.attributes.items()]
+            spans.append({
+                'traceId': self.trace_id,
+                'spanId': span.span_id,
+                **({'parentSpanId': span.parent_id} if span.parent_id else {}),
+                'name': span.name,
+                'kind': 1,
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns),
+                'attributes': attributes,
+                **({'status': {'code': 2, 'message': span.attributes['error']}}
+                   if 'error' in span.attributes else {}),
+            })
+        return {'resourceSpans': [{
+            'resource': {'attributes': [attribute('service.name', service_name)]},
+            'scopeSpans': [{'scope': {'name': 'har_analyzer.instrumentation'}, 'spans': spans}],
+        }]}
+
+    def export(self, path, format='otel'):
+        """Appends this run to `path`: one JSON document per line ('otel' or 'json')."""
+        if format not in ('otel', 'json'):
+            raise ValueError(f"Unknown export format: {format} (expected otel or json)")
+        document = self.to_otel() if format == 'otel' else self.to_dict()
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(document) + '\n')
+
+
+def _cprofile_report(profiler):
+    import pstats
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+    return out.getvalue()
+
+
+def _tracemalloc_report(snapshot, peak):
+    lines = [f"Peak traced memory: {peak / (1024 * 1024):.1f} MB", f"Top {PROFILE_TOP} allocation sites:"]
+    for stat in snapshot.statistics('lineno')[:PROFILE_TOP]:
+        lines.append(str(stat))
+    return "\n".join(lines)
+
+
+@contextmanager
+def record(name='har-analyzer', profile=None):
+    """
+    Activates a fresh `Recorder` for the enclosed block and yields it. With
+    `profile` set to 'cprofile' or 'tracemalloc', the block is also profiled
+    and the text report is left in `recorder.profile`.
+    """
+    recorder = Recorder(name).start(profile)
+    try:
+        yield recorder
+    except BaseException as e:
+        recorder.stop(e)
+        raise
+    finally:
+        recorder.stop()
@@ -1,43 +1,279 @@
-import streamlit as st
-from openai import OpenAI
-from typing import Any
+"""
+LLM summaries of rule findings.
 
-client = OpenAI(api_key=st.secrets["openai"]["api_key"])
+Findings are first collapsed by (rule, method, normalized endpoint), so the
+prompt holds one line per group rather than one per flagged request and its
+size is bounded however large the capture is. Summaries run on worker threads
+through `SummaryService` and are cached by a hash of the aggregated findings.
+The OpenAI client is only created on first use. The stub backend needs no
+network or key, for offline use and tests.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-def summarize_issues(requests_with_issues):
-    if not requests_with_issues:
-        return "No significant performance or reliability issues detected."
+import pandas as pd
+
+from compare import normalize_url, normalized_urls
+from rule_engine import SEVERITY_ORDER, default_plan
+
+LLM_BACKEND_ENV = 'HAR_ANALYZER_LLM_BACKEND'
+DEFAULT_MODEL = 'gpt-3.5-turbo'
+MODELS = ['gpt-3.5-turbo', 'gpt-4']
+
+# Upper bounds on what goes into one prompt
+MAX_PROMPT_GROUPS = 40
+MAX_EXAMPLES = 2
+MAX_PROMPT_CHARS = 12_000
+
+SYSTEM_PROMPT = "You are a helpful AI network performance analyst."
+INSTRUCTIONS = (
+    "You are a performance analyst. Summarize the following request-level issues "
+    "from a HAR file into a short, readable explanation that highlights common patterns, "
+    "potential root causes, and what to look at. Use concise technical language. "
+    "Each line is one rule firing on one endpoint, with how many requests hit it:\n\n"
+)
+
+
+def _severity_rank(severity):
+    return SEVERITY_ORDER.index(severity) if severity in SEVERITY_ORDER else len(SEVERITY_ORDER)
+
+
+def _bounded(groups, total_findings, max_groups):
+    groups.sort(key=lambda group: (_severity_rank(group['severity']), -group['count']))
+    kept = groups[:max_groups]
+    return {
+        'groups': kept,
+        'total_findings': int(total_findings),
+        'omitted_groups': len(groups) - len(kept),
+        'omitted_findings': int(sum(group['count'] for group in groups[max_groups:])),
+    }
+
+
+def aggregate_findings(hits, df, plan=None, max_groups=MAX_PROMPT_GROUPS, examples=MAX_EXAMPLES):
+    """
+    Collapses an `analyze_table` hit table into groups keyed by (rule, method,
+    normalized endpoint), with the request count, p50/p95 time and a few
+    distinct example messages each. Only the `max_groups` most severe and
+    frequent groups are kept; the rest are counted, not listed.
+    """
+    plan = plan or default_plan()
+    if hits.empty:
+        return _bounded([], 0, max_groups)
+
+    rows = df.loc[hits['request_index']]
+    frame = pd.DataFrame({
+        'rule_id': hits['rule_id'].astype(str).to_numpy(),
+        'method': rows['method'].astype(str).to_numpy(),
+        'endpoint': normalized_urls(rows).to_numpy(),
+        'time_ms': rows['time_ms'].to_numpy(dtype='float64'),
+        'request_index': hits['request_index'].to_numpy(),
+    })
 
-    all_messages = []
+    grouped = frame.groupby(['rule_id', 'method', 'endpoint'], sort=False)
+    stats = pd.DataFrame({
+        'count': grouped.size(),
+        'p50_time_ms': grouped['time_ms'].quantile(0.5).round(1),
+        'p95_time_ms': grouped['time_ms'].quantile(0.95).round(1),
+    }).reset_index()
+    stats['severity'] = stats['rule_id'].map(lambda rule_id: plan.rules[rule_id]['severity'])
+    groups = stats.to_dict(orient='records')
+    findings = _bounded(groups, len(hits), max_groups)
+
+    # Example messages embed the offending value; only built for the groups that are kept
+    rows_by_group = grouped.indices
+    request_index = frame['request_index'].to_numpy()
+    for group in findings['groups']:
+        group['count'] = int(group['count'])
+        messages = []
+        for row in request_index[rows_by_group[(group['rule_id'], group['method'], group['endpoint'])][:examples * 4]]:
+            message = plan.format_message(group['rule_id'], df.loc[row].to_dict())
+            if message not in messages:
+                messages.append(message)
+            if len(messages) == examples:
+                break
+        group['examples'] = messages
+    return findings
+
+
+def aggregate_request_issues(requests_with_issues, max_groups=MAX_PROMPT_GROUPS, examples=MAX_EXAMPLES):
+    """`aggregate_findings` for legacy records carrying an `issues` list (see `analyze_request`)."""
+    groups = {}
+    total = 0
     for req in requests_with_issues:
-        url = req.get('url', '')
-        issues = req.get('issues', [])
-        if issues:
-            issue_texts = [f"{i['message']}" for i in issues]
-            all_messages.append(f"Request: {url}\n" + "\n".join(issue_texts))
-
-    prompt = (
-        "You are a performance analyst. Summarize the following request-level issues "
-        "from a HAR file into a short, readable explanation that highlights common patterns, "
-        "potential root causes, and what to look at. Use concise technical language:\n\n"
-        + "\n\n".join(all_messages)
-    )
-
-    messages: Any = [
-        {"role": "system", "content": "You are a helpful AI network performance analyst."},
-        {"role": "user", "content": prompt}
+        endpoint = normalize_url(req.get('url', ''))
+        for issue in req.get('issues', []):
+            total += 1
+            key = (issue.get('rule_id') or issue.get('rule', ''), req.get('method', ''), endpoint)
+            group = groups.setdefault(key, {
+                'rule_id': key[0], 'severity': issue.get('severity', ''), 'method': key[1],
+                'endpoint': endpoint, 'count': 0, 'times': [], 'examples': [],
+            })
+            group['count'] += 1
+            group['times'].append(float(req.get('time_ms') or 0))
+            if len(group['examples']) < examples and issue['message'] not in group['examples']:
+                group['examples'].append(issue['message'])
+
+    for group in groups.values():
+        times = pd.Series(group.pop('times'))
+        group['p50_time_ms'] = round(float(times.quantile(0.5)), 1)
+        group['p95_time_ms'] = round(float(times.quantile(0.95)), 1)
+    return _bounded(list(groups.values()), total, max_groups)
+
+
+def build_messages(findings):
+    """Chat messages for the aggregated findings, capped at `MAX_PROMPT_CHARS`."""
+    lines = []
+    size = len(INSTRUCTIONS)
+    for group in findings['groups']:
+        line = (f"- [{group['severity']}] {group['rule_id']}: {group['method']} {group['endpoint']} — "
+                f"{group['count']} requests, p50 {group['p50_time_ms']:,.0f} ms, "
+                f"p95 {group['p95_time_ms']:,.0f} ms. e.g. {'; '.join(group['examples'])}")
+        if size + len(line) > MAX_PROMPT_CHARS:
+            break
+        lines.append(line)
+        size += len(line) + 1
+
+    listed = len(lines)
+    omitted = len(findings['groups']) - listed + findings['omitted_groups']
+    if omitted:
+        unlisted = findings['total_findings'] - sum(group['count'] for group in findings['groups'][:listed])
+        lines.append(f"- ... and {omitted} smaller groups ({unlisted} findings) not listed.")
+
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": INSTRUCTIONS + "\n".join(lines)},
     ]
 
-    model_choice = st.selectbox("Choose GPT Model", ["gpt-3.5-turbo", "gpt-4"], index=0)
 
-    try:
-        response = client.chat.completions.create(
-            model=model_choice,
+def findings_key(findings, backend):
+    """Cache key for a summary: the aggregated findings plus the backend/model producing it."""
+    payload = json.dumps({'backend': backend.cache_id, 'findings': findings}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class OpenAIBackend:
+    """Chat completions via the OpenAI API. The client is created on first use, not at import."""
+
+    def __init__(self, model=DEFAULT_MODEL, api_key=None, max_tokens=300, temperature=0.3):
+        self.model = model
+        self.api_key = api_key
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_id(self):
+        return f"openai:{self.model}"
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                api_key = self.api_key or os.environ.get('OPENAI_API_KEY')
+                if not api_key:
+                    raise ValueError("No OpenAI API key configured (st.secrets['openai']['api_key'] or OPENAI_API_KEY).")
+                from openai import OpenAI
+                self._client = OpenAI(api_key=api_key)
+            return self._client
+
+    def complete(self, messages):
+        response = self.client.chat.completions.create(
+            model=self.model,
             messages=messages,
-            max_tokens=300,
-            temperature=0.3
+            max_tokens=self.max_tokens,
+            temperature=self.temperature
         )
         return response.choices[0].message.content.strip()
 
+
+class StubBackend:
+    """Offline backend: echoes the most severe finding groups back as a canned summary."""
+
+    cache_id = 'stub'
+
+    def __init__(self, model=None, api_key=None, top=5):
+        self.top = top
+
+    def complete(self, messages):
+        lines = [line for line in messages[-1]['content'].splitlines() if line.startswith('- ')]
+        return "\n".join([f"**Offline summary** of {len(lines)} finding groups (stub backend):"] + lines[:self.top])
+
+
+BACKENDS = {'openai': OpenAIBackend, 'stub': StubBackend}
+
+
+def get_backend(name=None, **options):
+    """Backend by name, defaulting to `$HAR_ANALYZER_LLM_BACKEND` or 'openai'."""
+    name = name or os.environ.get(LLM_BACKEND_ENV, 'openai')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {name} (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name](**options)
+
+
+def summarize(findings, backend=None):
+    """Summarizes aggregated findings synchronously with `backend` (default: `get_backend()`)."""
+    if not findings['groups']:
+        return "No significant performance or reliability issues detected."
+    backend = backend or get_backend()
+    return backend.complete(build_messages(findings))
+
+
+def summarize_issues(requests_with_issues, backend=None):
+    """Legacy entry point: summarizes `analyze_request`-style records, aggregated first."""
+    if not requests_with_issues:
+        return "No significant performance or reliability issues detected."
+    try:
+        return summarize(aggregate_request_issues(requests_with_issues), backend)
     except Exception as e:
         return f"⚠️ GPT summary failed: {e}"
+
+
+class SummaryService:
+    """
+    Runs summaries on a small thread pool so the page never waits on the API.
+    Requests for the same aggregated findings share one call; finished
+    summaries stay cached (up to `max_cached`), failed ones are dropped so
+    they can be retried.
+    """
+
+    def __init__(self, max_workers=2, max_cached=256):
+        self.max_cached = max_cached
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-summary')
+        self._futures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, findings, backend):
+        """Starts (or reuses) the summary for `findings`; returns its key."""
+        key = findings_key(findings, backend)
+        with self._lock:
+            if key in self._futures:
+                self._futures.move_to_end(key)
+            else:
+                self._futures[key] = self._executor.submit(summarize, findings, backend)
+                # Evict the oldest finished summaries; running ones are kept
+                for old_key in list(self._futures):
+                    if len(self._futures) <= self.max_cached:
+                        break
+                    if self._futures[old_key].done():
+                        del self._futures[old_key]
+        return key
+
+    def done(self, key):
+        future = self._futures.get(key)
+        return future is not None and future.done()
+
+    def result(self, key):
+        """The summary if finished, else None. Re-raises the backend's error once, then forgets it."""
+        future = self._futures.get(key)
+        if future is None or not future.done():
+            return None
+        if future.exception() is not None:
+            with self._lock:
+                self._futures.pop(key, None)
+            raise future.exception()
+        return future.result()
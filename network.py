@@ -0,0 +1,218 @@
+"""
+Redirect chains and connection reuse: the 3xx hops and repeated TCP/TLS
+setup that the per-request rules cannot see.
+
+Chains are rebuilt by following each redirect's Location to the next request
+for that URL. Connection setup is judged per host, from the order of requests
+and their connect/ssl timings. Every lookup goes through hash or sorted
+indexes, so the whole pass is O(n log n) in the number of entries.
+"""
+from urllib.parse import urljoin
+
+import numpy as np
+import pandas as pd
+
+from url_index import UrlRankIndex
+
+# 304 Not Modified is a cache revalidation, not a hop
+REDIRECT_STATUSES = [301, 302, 303, 307, 308]
+
+CHAIN_COLUMNS = ['head_index', 'final_index', 'hops', 'final_status', 'wasted_ms', 'host', 'urls']
+HOST_COLUMNS = ['host', 'domain', 'requests', 'connections', 'missed_reuse', 'redundant_tls', 'wasted_ms']
+
+
+def _positive(df, column):
+    if column not in df.columns:
+        return np.zeros(len(df))
+    return np.clip(np.nan_to_num(df[column].to_numpy(dtype='float64'), nan=0.0), 0, None)
+
+
+def _start_order(df):
+    """Row positions ordered by start time; rows without a start keep file order at the end."""
+    start = df['start_ms'].to_numpy(dtype='float64') if 'start_ms' in df.columns else np.zeros(len(df))
+    return np.lexsort((np.arange(len(df)), np.isnan(start), np.nan_to_num(start)))
+
+
+def next_hops(df):
+    """
+    For every row, the position of the request its redirect led to, or -1.
+    That is the first request (in start order) after the redirect whose URL
+    equals the resolved Location.
+    """
+    n = len(df)
+    hops = np.full(n, -1, dtype='int64')
+    if 'redirect_url' not in df.columns or not n:
+        return hops
+
+    status = df['status'].to_numpy()
+    targets = df['redirect_url'].astype(str).to_numpy(dtype=object)
+    redirects = np.flatnonzero(np.isin(status, REDIRECT_STATUSES) & (targets != ''))
+    if not len(redirects):
+        return hops
+
+    urls = df['url'].astype(str).to_numpy(dtype=object)
+    # Location may be relative to the redirecting URL
+    resolved = np.array([urljoin(urls[i], targets[i]) for i in redirects], dtype=object)
+
+    order = _start_order(df)
+    rank = np.empty(n, dtype='int64')
+    rank[order] = np.arange(n)
+
+    # First request for the target URL that started after the redirect
+    hops[redirects] = UrlRankIndex(urls, rank).first_after(resolved, rank[redirects])
+    return hops
+
+
+def redirect_chains(df, hops=None):
+    """
+    One row per redirect chain: the first and final request, number of 3xx
+    hops, the final status, the URLs in order and `wasted_ms`, the total
+    time spent on the redirect responses themselves.
+    """
+    hops = next_hops(df) if hops is None else hops
+    status = df['status'].to_numpy()
+    is_redirect = np.isin(status, REDIRECT_STATUSES)
+    starts = np.flatnonzero(is_redirect)
+    # A chain starts at a redirect that no other redirect points to
+    pointed_to = np.zeros(len(df), dtype=bool)
+    pointed_to[hops[hops >= 0]] = True
+    heads = starts[~pointed_to[starts]]
+    if not len(heads):
+        return pd.DataFrame(columns=CHAIN_COLUMNS)
+
+    time_ms = _positive(df, 'time_ms')
+    urls = df['url'].astype(str).to_numpy(dtype=object)
+    domains = df['domain'].astype(str).to_numpy(dtype=object) if 'domain' in df.columns \
+        else np.array(['unknown'] * len(df), dtype=object)
+    rows = []
+    for head in heads.tolist():
+        chain = [head]
+        seen = {head}
+        current = head
+        # Follow redirects until a non-3xx response, a dead end or a loop
+        while is_redirect[current] and hops[current] >= 0 and hops[current] not in seen:
+            current = int(hops[current])
+            chain.append(current)
+            seen.add(current)
+        redirect_hops = [row for row in chain if is_redirect[row]]
+        rows.append({
+            'head_index': head,
+            'final_index': current,
+            'hops': len(redirect_hops),
+            'final_status': int(status[current]),
+            'wasted_ms': float(time_ms[redirect_hops].sum()),
+            'host': domains[head],
+            'urls': ' → '.join(urls[chain]),
+        })
+    return pd.DataFrame(rows, columns=CHAIN_COLUMNS).sort_values(
+        'wasted_ms', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def connection_setups(df):
+    """
+    Classifies every request's connection setup. Returns a DataFrame indexed
+    like `df` with `host` (server IP, or the domain when no IP was recorded)
+    and these flags:
+      - `new_connection`: the request paid for TCP connect.
+      - `missed_reuse`: that connect happened while an earlier connection to
+        the same host was idle, so keep-alive reuse was possible.
+      - `redundant_tls`: a TLS handshake on a connection id already used by
+        an earlier request.
+    `wasted_ms` is the avoidable dns+connect time (missed reuse) or ssl time
+    (redundant TLS).
+    """
+    n = len(df)
+    domains = df['domain'].astype(str).to_numpy(dtype=object) if 'domain' in df.columns \
+        else np.array(['unknown'] * n, dtype=object)
+    ips = df['server_ip'].astype(str).to_numpy(dtype=object) if 'server_ip' in df.columns \
+        else np.array([''] * n, dtype=object)
+    hosts = np.where(ips != '', ips, domains)
+    connect, ssl, dns = _positive(df, 'connect_time'), _positive(df, 'ssl_time'), _positive(df, 'dns_time')
+    new_connection = connect > 0
+
+    start = df['start_ms'].to_numpy(dtype='float64') if 'start_ms' in df.columns else np.zeros(n)
+    start = np.nan_to_num(start - np.nanmin(start)) if n and not np.isnan(start).all() else np.zeros(n)
+    end = start + _positive(df, 'time_ms')
+    host_codes, _ = pd.factorize(hosts)
+    host_codes = host_codes.astype('float64')
+
+    # Per-host timelines packed into one sorted axis: host * span + time
+    span = float(end.max()) + 1.0 if n else 1.0
+    start_keys = host_codes * span + start
+    end_keys = host_codes * span + end
+    order = np.lexsort((np.arange(n), start_keys))
+    sorted_starts = start_keys[order]
+    sorted_ends = np.sort(end_keys)
+
+    # Requests to this host already started and still in flight when this one starts
+    rank = np.empty(n, dtype='int64')
+    rank[order] = np.arange(n)
+    host_first = np.searchsorted(sorted_starts, host_codes * span, side='left')
+    started_before = rank - host_first
+    ended_before = np.searchsorted(sorted_ends, start_keys, side='right') - \
+        np.searchsorted(sorted_ends, host_codes * span, side='left')
+    in_flight = started_before - ended_before
+
+    # Connections opened to this host by earlier requests (assumed kept alive)
+    opened = np.cumsum(new_connection[order])
+    opened_before = np.empty(n, dtype='int64')
+    opened_before[order] = opened - new_connection[order]
+    opened_before -= np.concatenate([[0], opened])[host_first]
+
+    missed_reuse = new_connection & (in_flight < opened_before)
+
+    redundant_tls = np.zeros(n, dtype=bool)
+    if 'connection' in df.columns:
+        connections = df['connection'].astype(str).to_numpy(dtype=object)
+        keyed = connections != ''
+        ids = pd.Series(hosts + '|' + connections)
+        # A connection id seen on an earlier request should not need another handshake
+        seen_before = np.zeros(n, dtype=bool)
+        seen_before[order] = ids.iloc[order].duplicated().to_numpy()
+        redundant_tls = keyed & seen_before & (ssl > 0)
+
+    wasted = np.where(missed_reuse, connect + dns, 0.0) + np.where(redundant_tls & ~missed_reuse, ssl, 0.0)
+    return pd.DataFrame({
+        'host': hosts,
+        'domain': domains,
+        'new_connection': new_connection,
+        'missed_reuse': missed_reuse,
+        'redundant_tls': redundant_tls,
+        'wasted_ms': wasted,
+    }, index=df.index)
+
+
+def connection_summary(setups):
+    """Per-host totals from `connection_setups`, most wasted time first."""
+    if setups.empty:
+        return pd.DataFrame(columns=HOST_COLUMNS)
+    grouped = setups.groupby('host', sort=False)
+    summary = pd.DataFrame({
+        'domain': grouped['domain'].first(),
+        'requests': grouped.size(),
+        'connections': grouped['new_connection'].sum(),
+        'missed_reuse': grouped['missed_reuse'].sum(),
+        'redundant_tls': grouped['redundant_tls'].sum(),
+        'wasted_ms': grouped['wasted_ms'].sum(),
+    }).reset_index()
+    return summary.sort_values('wasted_ms', ascending=False, kind='stable')[HOST_COLUMNS].reset_index(drop=True)
+
+
+def build_network_report(df):
+    """Redirect chains, per-chain-host totals, per-host connection stats and headline numbers."""
+    chains = redirect_chains(df)
+    setups = connection_setups(df)
+    hosts = connection_summary(setups)
+    chain_hosts = chains.groupby('host', sort=False).agg(
+        chains=('hops', 'size'), hops=('hops', 'sum'), wasted_ms=('wasted_ms', 'sum')) \
+        .sort_values('wasted_ms', ascending=False).reset_index() if len(chains) \
+        else pd.DataFrame(columns=['host', 'chains', 'hops', 'wasted_ms'])
+    return {
+        'chains': chains,
+        'chain_hosts': chain_hosts,
+        'hosts': hosts,
+        'redirect_wasted_ms': float(chains['wasted_ms'].sum()) if len(chains) else 0.0,
+        'connection_wasted_ms': float(setups['wasted_ms'].sum()),
+        'missed_reuse': int(setups['missed_reuse'].sum()),
+        'redundant_tls': int(setups['redundant_tls'].sum()),
+    }
@@ -0,0 +1,244 @@
+"""
+Payload efficiency across a capture: responses sent without compression,
+resources downloaded more than once, and cache policies. Each finding
+carries an estimate of the bytes and transfer time that could be saved.
+
+Per-response flags are computed once per distinct mime type / Cache-Control
+value and broadcast to rows, and duplicates are found with a single groupby,
+so the pass is linear in the number of entries.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from har_parser import _map_categories
+
+# Bodies smaller than this gain little from compression (roughly one TCP packet)
+MIN_COMPRESSIBLE_BYTES = 1400
+# Wire size as a fraction of the decoded size when nothing in the capture says otherwise
+DEFAULT_COMPRESSED_FRACTION = 0.3
+# Fallback throughput for requests without a usable receive time
+DEFAULT_BYTES_PER_MS = 1250.0  # ~10 Mbit/s
+# max-age below this (seconds) counts as a short-lived cache policy
+SHORT_TTL_SECONDS = 3600
+
+COMPRESSED_ENCODINGS = frozenset(['gzip', 'br', 'deflate', 'zstd', 'compress'])
+_COMPRESSIBLE_PREFIXES = ('text/', 'application/json', 'application/javascript', 'application/x-javascript',
+                          'application/xml', 'application/ld+json', 'application/manifest+json',
+                          'image/svg+xml', 'font/ttf', 'font/otf', 'application/vnd.ms-fontobject')
+# Static asset types that should normally carry a long cache lifetime
+_STATIC_GROUPS = frozenset(['image', 'font', 'text/css', 'javascript'])
+_MAX_AGE = re.compile(r'(?:^|[,\s])(?:s-)?max-age\s*=\s*"?(\d+)', re.IGNORECASE)
+
+DUPLICATE_COLUMNS = ['key', 'url', 'downloads', 'wasted_bytes', 'wasted_ms', 'cache_policy', 'cacheable']
+UNCOMPRESSED_COLUMNS = ['request_index', 'url', 'mime_type', 'content_size', 'saved_bytes', 'saved_ms']
+
+
+def is_compressible(mime_type):
+    return mime_type.split(';')[0].strip().lower().startswith(_COMPRESSIBLE_PREFIXES)
+
+
+def cache_policy(cache_control):
+    """
+    Buckets a Cache-Control value: no-store, no-cache, private, short-ttl
+    (max-age under an hour), cacheable, or missing.
+    """
+    value = cache_control.lower()
+    if not value:
+        return 'missing'
+    if 'no-store' in value:
+        return 'no-store'
+    if 'no-cache' in value:
+        return 'no-cache'
+    match = _MAX_AGE.search(value)
+    if match and int(match.group(1)) < SHORT_TTL_SECONDS:
+        return 'short-ttl'
+    if 'private' in value and not match:
+        return 'private'
+    return 'cacheable'
+
+
+def _asset_kind(mime_type):
+    mime = mime_type.split(';')[0].strip().lower()
+    if 'javascript' in mime:
+        return 'javascript'
+    if mime == 'text/css':
+        return 'text/css'
+    return mime.split('/')[0]
+
+
+def _per_category(column, func, dtype=object):
+    """`func` applied once per distinct value of a categorical/text column, broadcast to rows."""
+    mapped = _map_categories(column, lambda value: func(str(value)))
+    # Missing values (code -1) pick the trailing func('') entry
+    values = np.append(np.asarray(mapped.categories, dtype=dtype), np.array([func('')], dtype=dtype))
+    return values[mapped.codes]
+
+
+def _numbers(df, column):
+    if column not in df.columns:
+        return np.full(len(df), -1.0)
+    return df[column].to_numpy(dtype='float64')
+
+
+def _text(df, column):
+    if column not in df.columns:
+        return pd.Categorical([''] * len(df))
+    return df[column]
+
+
+def response_efficiency(df):
+    """
+    Per-response view indexed like `df`: decoded and wire sizes, whether the
+    body was compressible and compressed, the compression ratio and, for
+    uncompressed bodies, the estimated `saved_bytes` and `saved_ms`.
+    """
+    content_size = _numbers(df, 'content_size')
+    body_size = _numbers(df, 'response_size')
+    transfer_size = _numbers(df, 'transfer_size')
+    compression = _numbers(df, 'compression')
+    receive = _numbers(df, 'receive_time')
+
+    # Decoded size falls back to the wire size when content.size is missing
+    decoded = np.where(content_size > 0, content_size, np.clip(body_size, 0, None))
+    wire = np.where(body_size >= 0, body_size, np.where(compression >= 0, content_size - compression, -1.0))
+
+    mime = _text(df, 'mime_type')
+    compressible = _per_category(mime, is_compressible, bool) & (decoded >= MIN_COMPRESSIBLE_BYTES)
+    encodings = _per_category(_text(df, 'content_encoding'),
+                              lambda value: value.strip().lower() in COMPRESSED_ENCODINGS, bool)
+    # Headers are sometimes stripped from exports; a body much smaller on the wire was still compressed
+    compressed = encodings | ((compression > 0) | ((wire > 0) & (wire < 0.9 * decoded)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(compressed & (wire > 0), decoded / wire, 1.0)
+
+    # Expected wire fraction per mime type, learned from the compressed responses in this capture
+    fraction = np.full(len(df), DEFAULT_COMPRESSED_FRACTION)
+    observed = compressed & compressible & (wire > 0)
+    if observed.any():
+        learned = pd.Series(wire[observed] / decoded[observed]).groupby(
+            np.asarray(mime)[observed]).median()
+        fraction = pd.Series(np.asarray(mime)).map(learned).fillna(DEFAULT_COMPRESSED_FRACTION).to_numpy()
+
+    uncompressed = compressible & ~compressed & (wire != 0)
+    saved_bytes = np.where(uncompressed, decoded * (1 - fraction), 0.0)
+
+    # Time saved at the throughput the response actually got while downloading
+    throughput = np.where((receive > 0) & (wire > 0), wire / np.where(receive > 0, receive, 1.0), np.nan)
+    typical = np.nanmedian(throughput) if np.isfinite(throughput).any() else DEFAULT_BYTES_PER_MS
+    throughput = np.where(np.isfinite(throughput), throughput, typical)
+    saved_ms = saved_bytes / throughput
+
+    return pd.DataFrame({
+        'content_size': decoded,
+        'wire_size': wire,
+        'transfer_size': transfer_size,
+        'compressible': compressible,
+        'compressed': compressed,
+        'compression_ratio': ratio,
+        'uncompressed': uncompressed,
+        'saved_bytes': saved_bytes,
+        'saved_ms': saved_ms,
+        'bytes_per_ms': throughput,
+    }, index=df.index)
+
+
+def duplicate_downloads(df, efficiency=None):
+    """
+    Resources fetched over the network more than once: successful GETs not
+    served from the browser cache, grouped by body hash when the capture has
+    content, else by URL. Every download after the first is counted as waste.
+    """
+    efficiency = response_efficiency(df) if efficiency is None else efficiency
+    status = df['status'].to_numpy()
+    methods = _text(df, 'method')
+    from_cache = _per_category(_text(df, 'cache_state'), lambda state: state in ('memory', 'disk'), bool)
+    downloaded = (status == 200) & (np.asarray(methods) == 'GET') & ~from_cache & \
+        (efficiency['wire_size'].to_numpy() != 0)
+    if not downloaded.any():
+        return pd.DataFrame(columns=DUPLICATE_COLUMNS)
+
+    rows = np.flatnonzero(downloaded)
+    urls = df['url'].astype(str).to_numpy(dtype=object)[rows]
+    hashes = _text(df, 'body_hash').astype(str).to_numpy(dtype=object)[rows] if 'body_hash' in df.columns \
+        else np.full(len(rows), '', dtype=object)
+    keys = np.where(hashes != '', 'body:' + hashes, urls)
+    policies = _per_category(_text(df, 'cache_control'), cache_policy)[rows]
+    frame = pd.DataFrame({
+        'key': keys,
+        'url': urls,
+        'bytes': np.clip(efficiency['wire_size'].to_numpy()[rows], 0, None),
+        'time_ms': np.clip(df['time_ms'].to_numpy(dtype='float64')[rows], 0, None),
+        'cache_policy': policies,
+    })
+
+    grouped = frame.groupby('key', sort=False)
+    downloads = grouped.size()
+    repeated = downloads[downloads > 1].index
+    if not len(repeated):
+        return pd.DataFrame(columns=DUPLICATE_COLUMNS)
+
+    # Waste is everything after the first download of each key
+    frame = frame[frame['key'].isin(repeated)]
+    later = frame[frame.duplicated('key')]
+    first = frame.drop_duplicates('key').set_index('key')
+    waste = later.groupby('key', sort=False).agg(wasted_bytes=('bytes', 'sum'), wasted_ms=('time_ms', 'sum'))
+    result = pd.DataFrame({
+        'url': first['url'],
+        'downloads': downloads[first.index],
+        'wasted_bytes': waste['wasted_bytes'],
+        'wasted_ms': waste['wasted_ms'],
+        'cache_policy': first['cache_policy'],
+    })
+    result['cacheable'] = result['cache_policy'] == 'cacheable'
+    result = result.reset_index()
+    return result.sort_values('wasted_bytes', ascending=False, kind='stable')[DUPLICATE_COLUMNS] \
+        .reset_index(drop=True)
+
+
+def cache_policies(df):
+    """Response counts per asset kind and cache policy; static kinds without a long TTL deserve a look."""
+    if df.empty:
+        return pd.DataFrame(columns=['asset', 'cache_policy', 'responses', 'static'])
+    frame = pd.DataFrame({
+        'asset': _per_category(_text(df, 'mime_type'), _asset_kind),
+        'cache_policy': _per_category(_text(df, 'cache_control'), cache_policy),
+    })
+    counts = frame.value_counts(['asset', 'cache_policy']).rename('responses').reset_index()
+    counts['static'] = counts['asset'].isin(_STATIC_GROUPS)
+    return counts
+
+
+def analyze_payloads(df, top=50):
+    """Compression, duplicate-download and caching findings with capture-wide totals."""
+    efficiency = response_efficiency(df)
+    duplicates = duplicate_downloads(df, efficiency)
+    uncompressed = efficiency[efficiency['uncompressed']]
+    biggest = uncompressed.nlargest(top, 'saved_bytes')
+    worst_uncompressed = pd.DataFrame({
+        'request_index': biggest.index,
+        'url': df.loc[biggest.index, 'url'].astype(str).to_numpy(),
+        'mime_type': df.loc[biggest.index, 'mime_type'].astype(str).to_numpy(),
+        'content_size': biggest['content_size'].to_numpy(),
+        'saved_bytes': biggest['saved_bytes'].to_numpy(),
+        'saved_ms': biggest['saved_ms'].to_numpy(),
+    }, columns=UNCOMPRESSED_COLUMNS)
+
+    wire = efficiency['wire_size'].clip(lower=0)
+    cacheable_duplicates = duplicates[duplicates['cacheable'].astype(bool)]
+    return {
+        'efficiency': efficiency,
+        'uncompressed': worst_uncompressed,
+        'duplicates': duplicates,
+        'cache_policies': cache_policies(df),
+        'total_wire_bytes': float(wire.sum()),
+        'total_content_bytes': float(efficiency['content_size'].sum()),
+        'uncompressed_responses': int(efficiency['uncompressed'].sum()),
+        'compression_saved_bytes': float(efficiency['saved_bytes'].sum()),
+        'compression_saved_ms': float(efficiency['saved_ms'].sum()),
+        'duplicate_downloads': int((duplicates['downloads'] - 1).sum()) if len(duplicates) else 0,
+        'duplicate_wasted_bytes': float(duplicates['wasted_bytes'].sum()) if len(duplicates) else 0.0,
+        'duplicate_wasted_ms': float(duplicates['wasted_ms'].sum()) if len(duplicates) else 0.0,
+        'cacheable_redownloads': int((cacheable_duplicates['downloads'] - 1).sum()) if len(cacheable_duplicates) else 0,
+    }
@@ -1,4 +1,279 @@
-def analyze_request(request):
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from har_parser import NUMERIC_COLUMNS
+from instrumentation import table_rows, timed
+
+# Rule registry shipped with the app; point HAR_ANALYZER_RULES at another
+# file to tune thresholds (e.g. per customer org) without a redeploy
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules.json')
+RULES_PATH_ENV = 'HAR_ANALYZER_RULES'
+
+REQUIRED_RULE_KEYS = ('id', 'field', 'operator', 'threshold', 'severity', 'message')
+
+# Request columns shown next to each finding
+FINDING_COLUMNS = ['method', 'url', 'status', 'time_ms', 'wait_time']
+
+# Most to least urgent, for ordering rule summaries
+SEVERITY_ORDER = ['critical', 'warning', 'medium', 'low', 'info']
+
+_OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+    # Half-open range [low, high), e.g. [500, 600] for 5xx
+    'between': lambda values, bounds: (values >= bounds[0]) & (values < bounds[1]),
+}
+
+
+def rules_path():
+    return os.environ.get(RULES_PATH_ENV) or DEFAULT_RULES_PATH
+
+
+def load_rules(source=None):
+    """
+    Loads a rule registry from a JSON (or, with PyYAML installed, YAML) file
+    path or open file object. Returns the list of rule definitions.
+    """
+    if source is None:
+        source = rules_path()
+
+    if isinstance(source, (str, os.PathLike)):
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"Rule file not found: {source}")
+        name = os.fspath(source)
+        with open(source, 'r', encoding='utf-8') as file:
+            text = file.read()
+    else:
+        name = getattr(source, 'name', '')
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        text = source.read()
+        if isinstance(text, bytes):
+            text = text.decode('utf-8')
+
+    if name.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML rule files require PyYAML; install it or use a JSON rule file.")
+        registry = yaml.safe_load(text)
+    else:
+        registry = json.loads(text)
+
+    rules = registry.get('rules') if isinstance(registry, dict) else registry
+    if not isinstance(rules, list) or not rules:
+        raise ValueError("Rule file must contain a non-empty 'rules' list.")
+    return rules
+
+
+def _is_number(value):
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+
+
+def _check_rule(rule):
+    """Raises ValueError unless `rule` can be evaluated against a request table and formatted."""
+    name = rule['id']
+    if rule['field'] not in NUMERIC_COLUMNS:
+        raise ValueError(f"Rule {name!r} reads unknown field {rule['field']!r} "
+                         f"(expected one of {', '.join(NUMERIC_COLUMNS)}).")
+    threshold = rule['threshold']
+    if rule['operator'] == 'between':
+        if not isinstance(threshold, (list, tuple)) or len(threshold) != 2 or \
+                not all(_is_number(bound) for bound in threshold):
+            raise ValueError(f"Rule {name!r} needs a [low, high] pair of numbers as its 'between' threshold.")
+    elif not _is_number(threshold):
+        raise ValueError(f"Rule {name!r} needs a numeric threshold, got {threshold!r}.")
+    if not _is_number(rule['default']):
+        raise ValueError(f"Rule {name!r} needs a numeric default, got {rule['default']!r}.")
+    if not isinstance(rule['message'], str):
+        raise ValueError(f"Rule {name!r} needs a text message.")
+    try:
+        # Timings may be fractional, so the message must accept both ints and floats
+        for value in (0, 0.5):
+            rule['message'].format(value=value, value_mb=value)
+    except (KeyError, IndexError, ValueError, AttributeError) as e:
+        raise ValueError(f"Rule {name!r} has a message that cannot be formatted "
+                         f"(only {{value}} and {{value_mb}} are available): {e!r}")
+
+
+def _field_value(value, default):
+    return default if value is None else value
+
+
+def _display(value):
+    # Columnar tables store timings as floats; show whole numbers as before
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _can_fire(rule, low, high):
+    """Uses a field's min/max to decide whether a rule could match any row at all."""
+    op, threshold = rule['operator'], rule['threshold']
+    if op == '>':
+        return high > threshold
+    if op == '>=':
+        return high >= threshold
+    if op == '<':
+        return low < threshold
+    if op == '<=':
+        return low <= threshold
+    if op == '==':
+        return low <= threshold <= high
+    if op == '!=':
+        return not (low == high == threshold)
+    return high >= threshold[0] and low < threshold[1]
+
+
+class RulePlan:
+    """
+    A rule registry compiled once into an evaluation plan. Rules are grouped by
+    the field they read so each column is fetched and range-checked a single
+    time, and rules that cannot match the current data are skipped.
+    """
+
+    def __init__(self, rules):
+        self.rules = {}
+        self.fields = {}
+        for definition in rules:
+            missing = [key for key in REQUIRED_RULE_KEYS if key not in definition]
+            if missing:
+                raise ValueError(f"Rule {definition.get('id', '?')!r} is missing {', '.join(missing)}.")
+            if definition['operator'] not in _OPERATORS:
+                raise ValueError(f"Rule {definition['id']!r} uses unknown operator {definition['operator']!r}.")
+            if definition['id'] in self.rules:
+                raise ValueError(f"Duplicate rule id {definition['id']!r}.")
+
+            rule = dict(definition)
+            rule.setdefault('rule', rule['id'])
+            rule.setdefault('default', -1)
+            next_step = rule.get('next_step', '')
+            rule['next_step'] = next_step if isinstance(next_step, str) else '\n'.join(next_step)
+            rule['suggestion'] = rule.get('suggestion', '')
+            rule['sf_context'] = rule.get('sf_context', '')
+            _check_rule(rule)
+            self.rules[rule['id']] = rule
+            self.fields.setdefault(rule['field'], []).append(rule['id'])
+
+        # Evaluation order; findings for a request are always reported in this order
+        self.rule_ids = list(self.rules)
+        # Identifies the exact registry, e.g. for caching results per rule set
+        self.fingerprint = hashlib.sha256(
+            json.dumps(list(self.rules.values()), sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def threshold(self, rule_id, default=None):
+        rule = self.rules.get(rule_id)
+        return rule['threshold'] if rule else default
+
+    def matches(self, rule_id, value):
+        rule = self.rules[rule_id]
+        return bool(_OPERATORS[rule['operator']](value, rule['threshold']))
+
+    def message_columns(self, df, columns=FINDING_COLUMNS):
+        """`columns` plus every rule field present in `df`: what `format_message` needs for a row."""
+        return list(columns) + [field for field in self.fields if field in df.columns and field not in columns]
+
+    def format_message(self, rule_id, request):
+        """Builds the per-hit message for a rule from the request's own values."""
+        rule = self.rules[rule_id]
+        value = _field_value(request.get(rule['field']), rule['default'])
+        return rule['message'].format(value=_display(value), value_mb=round(value / (1024 * 1024), 2))
+
+    def issue(self, rule_id, request):
+        """Expands a (request, rule_id) hit into the full finding dict returned by `analyze_request`."""
+        rule = self.rules[rule_id]
+        return {
+            "rule": rule["rule"],
+            "rule_id": rule_id,
+            "severity": rule["severity"],
+            "message": self.format_message(rule_id, request),
+            "suggestion": rule["suggestion"],
+            "sf_context": rule["sf_context"],
+            "next_step": rule["next_step"],
+        }
+
+    def analyze_request(self, request):
+        triggered = []
+        for field, rule_ids in self.fields.items():
+            for rule_id in rule_ids:
+                value = _field_value(request.get(field), self.rules[rule_id]['default'])
+                if self.matches(rule_id, value):
+                    triggered.append(rule_id)
+        triggered.sort(key=self.rule_ids.index)
+        return [self.issue(rule_id, request) for rule_id in triggered]
+
+    @timed('rules.masks', entries=lambda self, df: len(df))
+    def masks(self, df):
+        """Evaluates every applicable rule as one boolean mask over the whole table."""
+        masks = {}
+        for field, rule_ids in self.fields.items():
+            if field not in df.columns:
+                # Same fallback as the per-request path: the rule sees its default
+                for rule_id in rule_ids:
+                    if self.matches(rule_id, self.rules[rule_id]['default']):
+                        masks[rule_id] = np.ones(len(df), dtype=bool)
+                continue
+
+            values = df[field].to_numpy(dtype='float64', na_value=np.nan)
+            if not len(values) or np.isnan(values).all():
+                continue
+            low, high = np.nanmin(values), np.nanmax(values)
+            for rule_id in rule_ids:
+                rule = self.rules[rule_id]
+                if _can_fire(rule, low, high):
+                    masks[rule_id] = _OPERATORS[rule['operator']](values, rule['threshold'])
+        return masks
+
+    @timed('rules.analyze_table', entries=lambda self, df: len(df))
+    def analyze_table(self, df):
+        positions = []
+        codes = []
+        masks = self.masks(df)
+        for code, rule_id in enumerate(self.rule_ids):
+            if rule_id not in masks:
+                continue
+            hit = np.flatnonzero(masks[rule_id])
+            positions.append(hit)
+            codes.append(np.full(len(hit), code, dtype='int16'))
+
+        positions = np.concatenate(positions) if positions else np.empty(0, dtype='int64')
+        codes = np.concatenate(codes) if codes else np.empty(0, dtype='int16')
+        order = np.lexsort((codes, positions))
+        return pd.DataFrame({
+            'request_index': df.index.to_numpy()[positions[order]],
+            'rule_id': pd.Categorical.from_codes(codes[order], self.rule_ids),
+        })
+
+
+def compile_rules(rules):
+    return RulePlan(rules)
+
+
+@lru_cache(maxsize=None)
+def _plan_for(path, mtime):
+    return compile_rules(load_rules(path))
+
+
+def default_plan():
+    """Compiled plan for the configured rule file, recompiled only when the file changes."""
+    path = rules_path()
+    return _plan_for(path, os.path.getmtime(path))
+
+
+def rule_issue(rule_id, request, plan=None):
+    return (plan or default_plan()).issue(rule_id, request)
+
+
+def analyze_request(request, plan=None):
     """
     Applies rule-based checks to a single request.
     Returns a list of triggered rule dicts, each with:
@@ -6,121 +281,54 @@ def analyze_request(request):
       - severity: info | warning | critical
       - message: human-readable explanation
     """
-    results = []
-
-    # Rule 1: Slow TTFB (> 500ms)
-    wait_time = request.get('wait_time', -1)
-    if wait_time > 500:
-        results.append({
-            "rule": "Slow TTFB",
-            "rule_id": "Slow TTFB",
-            "severity": "warning",
-            "message": f"⚠️ Slow TTFB: {wait_time} ms",
-            "suggestion": "High TTFB usually means backend slowness, cold starts, or overloaded compute nodes.",
-            "sf_context": "May indicate long Apex execution time, slow SOQL queries, unindexed fields, "
-                          "or cold container starts on Hyperforce pods. "
-                          "Also observed during large transaction commits or lock contention.",
-            "next_step": "Check Apex execution time in debug logs\nInvestigate DB query plans\n"
-                         "Use Trust pod metrics or Apex CPU Time alerts",
-        })
+    return (plan or default_plan()).analyze_request(request)
 
-    # Rule 2: Large Payload (> 1MB)
-    response_size = request.get('response_size', -1)
-    if response_size > 1048576:
-        size_mb = round(response_size / (1024 * 1024), 2)
-        results.append({
-            "rule": "Large Payload",
-            "rule_id": "Large Payload",
-            "severity": "warning",
-            "message": f"⚠️ Large Payload: {size_mb} MB",
-            "suggestion": "Consider compressing or lazy-loading large assets to improve initial load time.",
-            "sf_context": "Common with large JSON responses from SOQL joins or unfiltered queries. "
-                          "Also caused by LWC/Aura components sending full record data "
-                          "or excessive static resource loads.",
-            "next_step": "Inspect payload via Dev Tools → Network\nEnable debug logs for SOQL optimization\n"
-                         "Audit component usage for lazy loading",
-        })
 
-    # Rule 3: Error Response
-    status = request.get('status', 0)
-    if 500 <= status < 600:
-        severity = "critical"
-        rule_id = "5xx Error"
-        suggestion = "Server-side failure. Could be due to app crash, dependency timeout, or server overload."
-        sf_context = ("Usually indicates unhandled Apex exceptions, "
-                      "timeouts in chained processes (e.g., Platform Events), or infrastructure faults.")
-        next_step = ("Review debug logs and exception traces\nCheck Splunk for backend service failures\n"
-                     "Review recent deployments or Flow changes")
-
-    elif 400 <= status < 500:
-        severity = "warning"
-        rule_id = "4xx Error"
-        suggestion = "Client-side issue. Could be malformed request, missing auth token, or bad URL."
-        sf_context = ("Often seen when expired session tokens, incorrect REST API version, "
-                      "or missing headers (like Authorization) are involved. "
-                      "Also happens during LWR/Aura misrouting or CORS issues.")
-        next_step = ("Re-authenticate and retry\nEnsure correct endpoint structure and headers\n"
-                     "Check browser console for CORS or redirect loops")
+def analyze_table(df, plan=None):
+    """
+    Batch counterpart of `analyze_request`. Returns a compact hit table with one
+    row per finding: `request_index` (the label in `df`) and a categorical
+    `rule_id`, ordered by request then rule. Rule text lives once in the plan;
+    use `rule_issue` to expand a hit into a full finding.
+    """
+    return (plan or default_plan()).analyze_table(df)
 
-    else:
-        severity = None
-        rule_id = None
-        suggestion = None
-        sf_context = None
-        next_step = None
-
-    if severity:
-        results.append({
-            "rule": "Error Response",
-            "rule_id": rule_id,
-            "severity": severity,
-            "message": f"❌ Error Response: HTTP {status}",
-            "suggestion": suggestion,
-            "sf_context": sf_context,
-            "next_step": next_step,
-        })
 
-    # Rule 4: Redirects
-    redirect_time = request.get('redirect_time', 0)
-    if redirect_time > 0:
-        results.append({
-            "rule": "Redirect Chain",
-            "rule_id": "Redirect Chain",
-            "severity": "info",
-            "message": f"🔁 Redirected: {redirect_time} ms",
-            "suggestion": "Excessive redirects can degrade performance. Consider reducing hops or caching redirect results.",
-            "sf_context": "Seen in Experience Cloud (Sites/Communities) with login redirects, custom domain misconfigurations, "
-                          "or nested Visualforce → LWR transitions. Sometimes caused by identity providers (SSO).",
-            "next_step": "Use browser Dev Tools to trace redirect chain\nReview domain setup and My Domain routing\n"
-                         "Test behavior with incognito or different auth flow",
-        })
+@timed('rules.summarize_hits', entries=table_rows)
+def summarize_hits(hits, df, plan=None, top_domains=3):
+    """
+    Groups a hit table by rule: one row per rule with its severity, hit count,
+    p50/p95 of `time_ms` and the most frequently hit domains. Rows are ordered
+    by severity, then count.
+    """
+    plan = plan or default_plan()
+    columns = ['rule_id', 'rule', 'severity', 'count', 'p50_time_ms', 'p95_time_ms', 'top_domains']
+    if hits.empty:
+        return pd.DataFrame(columns=columns)
 
-    # Rule 5: High Connect Time
-    connect = request.get('connect_time', -1)
-    if connect > 500:
-        results.append({
-            "rule": "High Connect Time",
-            "rule_id": "High Connect Time",
-            "severity": "medium",
-            "message": f"Connect Time High: {connect} ms",
-            "suggestion": "May indicate poor client network or proxy interference. Check endpoint proximity and routing.",
-            "sf_context": "Common for users connecting from distant regions to a mismatched Hyperforce pod "
-                          "(e.g., EMEA to US-West). Also seen when customers use Zscaler or strict firewall policies.",
-            "next_step": "Compare performance across regions/IPs\nAsk customer to test without VPN or proxy"
-        })
+    rows = df.loc[hits['request_index']]
+    joined = pd.DataFrame({
+        'rule_id': hits['rule_id'].to_numpy(),
+        'time_ms': rows['time_ms'].to_numpy(),
+        'domain': rows['domain'].to_numpy() if 'domain' in rows.columns else 'unknown',
+    })
+    by_rule = joined.groupby('rule_id', observed=True)['time_ms']
+    summary = pd.DataFrame({
+        'count': by_rule.size(),
+        'p50_time_ms': by_rule.quantile(0.5),
+        'p95_time_ms': by_rule.quantile(0.95),
+    })
 
-    # Rule 6: High DNS Time
-    dns = request.get('dns_time', -1)
-    if dns > 300:
-        results.append({
-            "rule": "High DNS Time",
-            "rule_id": "High DNS Time",
-            "severity": "low",
-            "message": f"DNS Lookup Slow: {dns} ms",
-            "suggestion": "Slow DNS resolution can result from custom resolvers or misrouted traffic.",
-            "sf_context": "Often indicates stale or poorly resolving DNS routes for custom domains. "
-                          "Can also happen with misconfigured vanity URLs or regional failover during Trust incident.",
-            "next_step": "Flush DNS and retry\nVerify domain TTL and propagation\nCompare with default Salesforce domain behavior"
-        })
+    domain_counts = joined.groupby(['rule_id', 'domain'], observed=True).size()
+    domain_counts = domain_counts.sort_values(ascending=False, kind='stable')
+    summary['top_domains'] = domain_counts.groupby(level='rule_id', observed=True).apply(
+        lambda counts: ', '.join(f"{domain} ({n})" for (_, domain), n in counts.head(top_domains).items()))
 
-    return results
+    summary = summary.reset_index()
+    summary['rule_id'] = summary['rule_id'].astype(str)
+    summary['rule'] = summary['rule_id'].map(lambda rule_id: plan.rules[rule_id]['rule'])
+    summary['severity'] = summary['rule_id'].map(lambda rule_id: plan.rules[rule_id]['severity'])
+    rank = summary['severity'].map(
+        lambda severity: SEVERITY_ORDER.index(severity) if severity in SEVERITY_ORDER else len(SEVERITY_ORDER))
+    summary = summary.assign(_rank=rank).sort_values(['_rank', 'count'], ascending=[True, False], kind='stable')
+    return summary[columns].reset_index(drop=True)
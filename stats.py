@@ -0,0 +1,246 @@
+"""
+Latency statistics per domain or per normalized endpoint: request count,
+p50/p90/p99 of `time_ms` and the share of time spent in each timing phase.
+
+`group_stats` computes exact figures for one request table. For many captures,
+`StatsAccumulator` keeps a DDSketch per group instead of raw rows. Accumulators
+from different files merge losslessly (up to the sketch's relative accuracy),
+so fleet-wide percentiles never need every request in memory at once.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from compare import normalized_urls
+
+PHASES = ['blocked_time', 'dns_time', 'connect_time', 'ssl_time', 'wait_time']
+QUANTILES = [0.5, 0.9, 0.99]
+STATS_COLUMNS = ['count', 'p50_time_ms', 'p90_time_ms', 'p99_time_ms', 'total_time_ms'] + \
+                [f"{phase.replace('_time', '')}_share" for phase in PHASES]
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+class DDSketch:
+    """
+    Mergeable quantile sketch with relative-error guarantees (Masson et al.,
+    VLDB 2019). Positive values fall into logarithmic buckets; a quantile is
+    within `relative_accuracy` of the true value. Two sketches with the same
+    accuracy merge by adding bucket counts.
+    """
+
+    # Values at or below this are counted as zero (HAR timings are ms; 1 ns is noise)
+    MIN_VALUE = 1e-6
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1.")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, values):
+        """Adds an array of non-negative values."""
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        positive = values[values > self.MIN_VALUE]
+        self.zero_count += len(values) - len(positive)
+        keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype('int64'), return_counts=True)
+        self._add_bins(keys.tolist(), counts.tolist())
+        return self
+
+    def _add_bins(self, keys, counts):
+        bins = self.bins
+        for key, count in zip(keys, counts):
+            bins[key] = bins.get(key, 0) + count
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy.")
+        self._add_bins(other.bins.keys(), other.bins.values())
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantiles(self, qs):
+        """Estimates for each quantile in `qs` (0..1); NaN for an empty sketch."""
+        if not self.count:
+            return [math.nan] * len(qs)
+        keys = sorted(self.bins)
+        cumulative = np.cumsum([self.bins[key] for key in keys]) + self.zero_count
+        results = []
+        for q in qs:
+            rank = q * (self.count - 1)
+            if rank < self.zero_count:
+                value = 0.0
+            else:
+                key = keys[int(np.searchsorted(cumulative, rank, side='right'))]
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+            # Bucket midpoints can overshoot the observed range at the extremes
+            results.append(min(max(value, self.min), self.max))
+        return results
+
+    def quantile(self, q):
+        return self.quantiles([q])[0]
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'bins': {str(key): count for key, count in self.bins.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'])
+        sketch.bins = {int(key): count for key, count in data['bins'].items()}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        if sketch.count:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+
+def group_keys(df, by='domain'):
+    """The grouping column for `by` = 'domain' or 'endpoint' (normalized URL, see `compare.normalize_url`)."""
+    if by == 'domain':
+        return df['domain'].astype(str).to_numpy(dtype=object)
+    if by == 'endpoint':
+        return normalized_urls(df).to_numpy()
+    raise ValueError(f"Unknown grouping: {by}")
+
+
+def _frame(df, by):
+    """Per-row group key, clipped time and clipped phases (-1 = not captured counts as 0)."""
+    frame = pd.DataFrame({'key': group_keys(df, by),
+                          'time_ms': np.clip(df['time_ms'].to_numpy(dtype='float64'), 0, None)})
+    for phase in PHASES:
+        frame[phase] = np.clip(df[phase].to_numpy(dtype='float64'), 0, None) if phase in df.columns else 0.0
+    return frame
+
+
+def _finish(stats):
+    # Shares are of total request time; HAR counts ssl inside connect, so they may overlap
+    total = stats['total_time_ms'].where(stats['total_time_ms'] > 0)
+    for phase in PHASES:
+        stats[f"{phase.replace('_time', '')}_share"] = (stats.pop(f"{phase}_sum") / total).fillna(0.0)
+    stats.index.name = 'key'
+    return stats.sort_values('p99_time_ms', ascending=False, kind='stable')[STATS_COLUMNS].reset_index()
+
+
+def group_stats(df, by='domain', rows=None):
+    """
+    Exact count, p50/p90/p99 of `time_ms`, total time and per-phase share of
+    that time, one row per domain or endpoint, slowest p99 first. `rows`
+    (positions, e.g. `FilterIndex.positions`) limits the stats to those rows;
+    only the columns the stats read are taken from them.
+    """
+    if rows is not None:
+        columns = [column for column in ['domain' if by == 'domain' else 'url', 'time_ms'] + PHASES
+                   if column in df.columns]
+        df = df.iloc[rows, [df.columns.get_loc(column) for column in columns]]
+    if df.empty:
+        return pd.DataFrame(columns=['key'] + STATS_COLUMNS)
+    frame = _frame(df, by)
+    grouped = frame.groupby('key', sort=False)
+    stats = pd.DataFrame({'count': grouped.size()})
+    quantiles = grouped['time_ms'].quantile(QUANTILES).unstack()
+    for q in QUANTILES:
+        stats[f"p{round(q * 100)}_time_ms"] = quantiles[q]
+    stats['total_time_ms'] = grouped['time_ms'].sum()
+    for phase in PHASES:
+        stats[f"{phase}_sum"] = grouped[phase].sum()
+    return _finish(stats)
+
+
+class StatsAccumulator:
+    """
+    Mergeable per-group statistics: a `DDSketch` of `time_ms` plus phase sums
+    for every domain or endpoint. Add request tables one at a time, merge
+    accumulators built in other processes, then call `to_frame`.
+    """
+
+    def __init__(self, by='domain', relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.by = by
+        self.relative_accuracy = relative_accuracy
+        self.groups = {}
+
+    def _group(self, key):
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {'sketch': DDSketch(self.relative_accuracy),
+                                        'sums': dict.fromkeys(['time_ms'] + PHASES, 0.0)}
+        return group
+
+    def add(self, df):
+        frame = _frame(df, self.by)
+        sums = frame.groupby('key', sort=False)[['time_ms'] + PHASES].sum()
+        for key, row in zip(sums.index, sums.to_dict(orient='records')):
+            group_sums = self._group(key)['sums']
+            for column, value in row.items():
+                group_sums[column] += value
+
+        codes, keys = pd.factorize(frame['key'], sort=False)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+        times = frame['time_ms'].to_numpy()[order]
+        for i, key in enumerate(keys):
+            self._group(key)['sketch'].add(times[bounds[i]:bounds[i + 1]])
+        return self
+
+    def merge(self, other):
+        if other.by != self.by:
+            raise ValueError("Cannot merge statistics grouped by different keys.")
+        for key, other_group in other.groups.items():
+            group = self._group(key)
+            group['sketch'].merge(other_group['sketch'])
+            for column, value in other_group['sums'].items():
+                group['sums'][column] += value
+        return self
+
+    def to_frame(self):
+        """Same columns as `group_stats`, with sketch-estimated quantiles."""
+        rows = {}
+        for key, group in self.groups.items():
+            sketch = group['sketch']
+            row = {'count': sketch.count, 'total_time_ms': group['sums']['time_ms']}
+            for q, value in zip(QUANTILES, sketch.quantiles(QUANTILES)):
+                row[f"p{round(q * 100)}_time_ms"] = value
+            for phase in PHASES:
+                row[f"{phase}_sum"] = group['sums'][phase]
+            rows[key] = row
+        columns = ['count', 'total_time_ms'] + [f"p{round(q * 100)}_time_ms" for q in QUANTILES] + \
+                  [f"{phase}_sum" for phase in PHASES]
+        return _finish(pd.DataFrame.from_dict(rows, orient='index', columns=columns))
+
+    def to_dict(self):
+        return {
+            'by': self.by,
+            'relative_accuracy': self.relative_accuracy,
+            'groups': {key: {'sketch': group['sketch'].to_dict(), 'sums': group['sums']}
+                       for key, group in self.groups.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        accumulator = cls(data['by'], data['relative_accuracy'])
+        for key, group in data['groups'].items():
+            accumulator.groups[key] = {'sketch': DDSketch.from_dict(group['sketch']), 'sums': dict(group['sums'])}
+        return accumulator
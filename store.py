@@ -0,0 +1,348 @@
+"""
+Persistent on-disk store of analyzed captures, for re-opening a HAR without
+re-parsing it and for queries across every stored capture.
+
+    python store.py add captures/*.har
+    python store.py list
+    python store.py query --domain acme.my.salesforce.com --field wait_time --q 95 --last 500
+
+Layout of the store directory:
+
+    index.sqlite                 captures, plus one index row per request and per rule hit
+    <capture_id>.arrow           the full request table (Arrow IPC, memory-mapped on open)
+    <capture_id>.headers.arrow   redacted request headers
+
+Captures are keyed by `content_hash`, the same key the dashboard caches under.
+Only redacted headers are ever written.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis_cache import content_hash
+from har_parser import load_request_table
+from rule_engine import analyze_table, compile_rules, default_plan, load_rules
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser('~'), '.har_analyzer', 'store')
+STORE_DIR_ENV = 'HAR_ANALYZER_STORE'
+
+# Request table columns mirrored into SQLite for cross-capture queries
+INDEXED_COLUMNS = ['domain', 'method', 'status', 'mime_group', 'time_ms', 'wait_time',
+                   'dns_time', 'connect_time', 'ssl_time', 'response_size']
+NUMERIC_FIELDS = ['status', 'time_ms', 'wait_time', 'dns_time', 'connect_time', 'ssl_time', 'response_size']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    capture_id TEXT PRIMARY KEY,
+    name TEXT,
+    stored_at REAL,
+    requests INTEGER,
+    hits INTEGER,
+    total_time_ms REAL,
+    rules_fingerprint TEXT
+);
+CREATE TABLE IF NOT EXISTS requests (
+    capture_id TEXT,
+    request_index INTEGER,
+    domain TEXT,
+    method TEXT,
+    status INTEGER,
+    mime_group TEXT,
+    time_ms REAL,
+    wait_time REAL,
+    dns_time REAL,
+    connect_time REAL,
+    ssl_time REAL,
+    response_size INTEGER
+);
+CREATE TABLE IF NOT EXISTS hits (
+    capture_id TEXT,
+    request_index INTEGER,
+    rule_id TEXT,
+    severity TEXT
+);
+CREATE INDEX IF NOT EXISTS captures_stored_at ON captures (stored_at);
+CREATE INDEX IF NOT EXISTS requests_capture ON requests (capture_id, request_index);
+CREATE INDEX IF NOT EXISTS requests_domain ON requests (domain, capture_id);
+CREATE INDEX IF NOT EXISTS requests_status ON requests (status);
+CREATE INDEX IF NOT EXISTS requests_time ON requests (time_ms);
+CREATE INDEX IF NOT EXISTS hits_capture ON hits (capture_id);
+CREATE INDEX IF NOT EXISTS hits_rule ON hits (rule_id, capture_id);
+"""
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError:
+        raise ValueError("The capture store requires pyarrow; install it to save or reopen captures.")
+    return pa
+
+
+def store_dir():
+    return os.environ.get(STORE_DIR_ENV, DEFAULT_STORE_DIR)
+
+
+class StoredHeaders:
+    """
+    Read-only stand-in for `HeaderTable` backed by a memory-mapped Arrow
+    column; a row is only decoded when it is looked up.
+    """
+
+    def __init__(self, column):
+        self._column = column
+
+    def __len__(self):
+        return len(self._column)
+
+    def __getitem__(self, row):
+        return self._column[int(row)].as_py()
+
+    @property
+    def nbytes(self):
+        # Pages are backed by the mapped file, not the heap
+        return 0
+
+
+def _headers_array(pa, headers):
+    """Flattens a `HeaderTable` into one list<struct<name, value>> array, without per-row dicts."""
+    names, values, offsets = [], [], [0]
+    for row in range(len(headers)):
+        pairs = headers.pairs(row)
+        names.extend(name for name, _ in pairs)
+        values.extend(value for _, value in pairs)
+        offsets.append(len(names))
+    pairs = pa.StructArray.from_arrays([pa.array(names, pa.string()), pa.array(values, pa.string())],
+                                       names=['name', 'value'])
+    return pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), pairs)
+
+
+class CaptureStore:
+    """
+    Directory of analyzed captures. Each capture's request table and headers
+    live in Arrow files. A shared SQLite index holds the capture list and
+    slim per-request and per-hit rows, indexed by domain, status, time and
+    rule_id. Fleet-wide queries only touch that index.
+
+    One store may be shared by several threads (e.g. dashboard sessions), so
+    every use of the SQLite connection goes through a lock.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or store_dir()
+        os.makedirs(self.path, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(self.path, 'index.sqlite'), timeout=30,
+                                   check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _file(self, capture_id, suffix='.arrow'):
+        # Ids are hex digests; anything else must not reach the filesystem
+        if not capture_id or not all(c in '0123456789abcdef' for c in capture_id):
+            raise ValueError(f"Invalid capture id: {capture_id!r}")
+        return os.path.join(self.path, capture_id + suffix)
+
+    def __contains__(self, capture_id):
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM captures WHERE capture_id = ?", (capture_id,)).fetchone()
+        return row is not None
+
+    def captures(self, limit=None):
+        """Stored captures, most recent first."""
+        sql = "SELECT * FROM captures ORDER BY stored_at DESC"
+        params = ()
+        if limit:
+            sql += " LIMIT ?"
+            params = (int(limit),)
+        with self._lock:
+            return pd.read_sql_query(sql, self._db, params=params)
+
+    def save(self, capture_id, df, headers, hits, name='', plan=None):
+        """
+        Writes the request table, redacted headers and rule hits for one
+        capture, replacing any earlier copy stored under the same id.
+        """
+        pa = _pyarrow()
+        plan = plan or default_plan()
+
+        # Write to temporary names first so a crash never leaves a half-written capture
+        for suffix, table in (('.arrow', pa.Table.from_pandas(df, preserve_index=False)),
+                              ('.headers.arrow', pa.table({'headers': _headers_array(pa, headers)}))):
+            path = self._file(capture_id, suffix)
+            with pa.OSFile(path + '.tmp', 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(path + '.tmp', path)
+
+        rows = pd.DataFrame({column: df[column].to_numpy() for column in INDEXED_COLUMNS})
+        for column in ('domain', 'method', 'mime_group'):
+            rows[column] = rows[column].astype(str)
+        rows.insert(0, 'request_index', np.arange(len(df)))
+        rows.insert(0, 'capture_id', capture_id)
+        rule_ids = hits['rule_id'].astype(str)
+        hit_rows = zip([capture_id] * len(hits), hits['request_index'].tolist(), rule_ids.tolist(),
+                       rule_ids.map(lambda rule_id: plan.rules[rule_id]['severity']).tolist())
+
+        with self._lock, self._db:
+            self._delete_rows(capture_id)
+            self._db.execute(
+                "INSERT INTO captures VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (capture_id, name, time.time(), len(df), len(hits),
+                 float(df['time_ms'].clip(lower=0).sum()), plan.fingerprint))
+            self._db.executemany(
+                f"INSERT INTO requests VALUES ({', '.join('?' * len(rows.columns))})",
+                rows.itertuples(index=False, name=None))
+            self._db.executemany("INSERT INTO hits VALUES (?, ?, ?, ?)", hit_rows)
+
+    def open(self, capture_id):
+        """
+        Re-opens a stored capture as `(df, headers)` without parsing anything.
+        The Arrow files are memory-mapped, and the numeric columns and the
+        codes of categorical columns are zero-copy, read-only views of the
+        mapped pages. Only category labels and the start_time strings are
+        copied onto the heap. Headers stay on disk until a row is read.
+        """
+        if capture_id not in self:
+            raise ValueError(f"Capture {capture_id} is not in the store.")
+        pa = _pyarrow()
+        table = pa.ipc.open_file(pa.memory_map(self._file(capture_id))).read_all()
+        headers = pa.ipc.open_file(pa.memory_map(self._file(capture_id, '.headers.arrow'))).read_all()
+        # One block per column, so pandas never consolidates (copies) the mapped buffers
+        return table.to_pandas(split_blocks=True), StoredHeaders(headers.column('headers'))
+
+    def hits(self, capture_id):
+        """The rule hits recorded when the capture was stored."""
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT request_index, rule_id, severity FROM hits WHERE capture_id = ? ORDER BY rowid",
+                self._db, params=(capture_id,))
+
+    def _delete_rows(self, capture_id):
+        # Callers hold the lock and an open transaction
+        for table in ('captures', 'requests', 'hits'):
+            self._db.execute(f"DELETE FROM {table} WHERE capture_id = ?", (capture_id,))
+
+    def delete(self, capture_id):
+        with self._lock, self._db:
+            self._delete_rows(capture_id)
+        for suffix in ('.arrow', '.headers.arrow'):
+            path = self._file(capture_id, suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def query_requests(self, columns=None, domain=None, status=None, rule_id=None,
+                       min_time_ms=None, last=None):
+        """
+        Index rows of requests across stored captures, filtered on the indexed
+        columns. `last` limits the search to the most recently stored captures.
+        """
+        columns = columns or ['capture_id', 'request_index'] + INDEXED_COLUMNS
+        unknown = set(columns) - {'capture_id', 'request_index', *INDEXED_COLUMNS}
+        if unknown:
+            raise ValueError(f"Unknown request columns: {', '.join(sorted(unknown))}")
+
+        where, params = [], []
+        if domain is not None:
+            where.append("r.domain = ?")
+            params.append(domain)
+        if status is not None:
+            where.append("r.status = ?")
+            params.append(int(status))
+        if min_time_ms is not None:
+            where.append("r.time_ms >= ?")
+            params.append(float(min_time_ms))
+        if rule_id is not None:
+            where.append("EXISTS (SELECT 1 FROM hits h WHERE h.rule_id = ? AND h.capture_id = r.capture_id "
+                         "AND h.request_index = r.request_index)")
+            params.append(rule_id)
+        if last:
+            where.append("r.capture_id IN (SELECT capture_id FROM captures ORDER BY stored_at DESC LIMIT ?)")
+            params.append(int(last))
+
+        sql = f"SELECT {', '.join('r.' + column for column in columns)} FROM requests r"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            return pd.read_sql_query(sql, self._db, params=params)
+
+    def percentile(self, field='wait_time', q=95, **filters):
+        """
+        `q`th percentile of `field` over the matching requests across captures,
+        e.g. `percentile('wait_time', 95, domain='x.force.com', last=500)`.
+        Values recorded as -1 (not captured) are ignored; NaN when nothing matches.
+        """
+        if field not in NUMERIC_FIELDS:
+            raise ValueError(f"Unknown numeric field: {field}")
+        values = self.query_requests(columns=[field], **filters)[field].to_numpy(dtype='float64')
+        values = values[values >= 0]
+        return float(np.percentile(values, q)) if len(values) else float('nan')
+
+
+def store_har(store, path, plan=None):
+    """Parses, analyzes and stores one HAR file unless it is already stored. Returns its capture id."""
+    capture_id = content_hash(path)
+    if capture_id not in store:
+        plan = plan or default_plan()
+        df, headers = load_request_table(path)
+        store.save(capture_id, df, headers, analyze_table(df, plan=plan), name=os.path.basename(path), plan=plan)
+    return capture_id
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store analyzed HAR files and query across them.")
+    parser.add_argument('--store', default=None, help=f"store directory (default: ${STORE_DIR_ENV} or {DEFAULT_STORE_DIR})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="analyze and store HAR files")
+    add.add_argument('paths', nargs='+')
+    add.add_argument('--rules', default=None, help="rule registry file (default: rules.json)")
+
+    commands.add_parser('list', help="list stored captures")
+
+    query = commands.add_parser('query', help="percentile of a timing field across stored captures")
+    query.add_argument('--field', choices=NUMERIC_FIELDS, default='wait_time')
+    query.add_argument('--q', type=float, default=95)
+    query.add_argument('--domain')
+    query.add_argument('--status', type=int)
+    query.add_argument('--rule-id')
+    query.add_argument('--last', type=int, help="only the N most recently stored captures")
+
+    remove = commands.add_parser('delete', help="remove a stored capture")
+    remove.add_argument('capture_id')
+    args = parser.parse_args(argv)
+
+    store = CaptureStore(args.store)
+    try:
+        if args.command == 'add':
+            plan = compile_rules(load_rules(args.rules)) if args.rules else default_plan()
+            for path in args.paths:
+                print(f"{store_har(store, path, plan)}  {path}")
+        elif args.command == 'list':
+            with pd.option_context('display.width', 200):
+                print(store.captures().to_string(index=False))
+        elif args.command == 'query':
+            value = store.percentile(args.field, args.q, domain=args.domain, status=args.status,
+                                     rule_id=args.rule_id, last=args.last)
+            print(f"p{args.q:g} {args.field}: {value:.1f}")
+        else:
+            store.delete(args.capture_id)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from analysis_cache import ByteLRUCache, content_hash, estimate_nbytes
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = ByteLRUCache(max_bytes=100)
+    cache.put('a', 'A', nbytes=40)
+    cache.put('b', 'B', nbytes=40)
+    assert cache.total_bytes == 80
+
+    # Reading 'a' makes 'b' the least recently used
+    assert cache.get('a') == 'A'
+    cache.put('c', 'C', nbytes=30)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.total_bytes == 70
+
+    # Replacing an entry re-charges it instead of counting it twice
+    cache.put('a', 'A2', nbytes=60)
+    assert cache.total_bytes == 90 and cache.get('a') == 'A2'
+
+    # 'c' is now the oldest; evicting it alone is not enough, so 'a' goes too
+    cache.put('d', 'D', nbytes=50)
+    assert len(cache) == 1 and 'd' in cache
+    assert cache.total_bytes == 50
+
+
+def test_eviction_keeps_total_within_budget():
+    rng = np.random.default_rng(0)
+    cache = ByteLRUCache(max_bytes=1000)
+    for key in range(500):
+        cache.put(key % 37, key, nbytes=int(rng.integers(1, 300)))
+        if rng.random() < 0.3:
+            cache.get(int(rng.integers(0, 37)))
+        assert cache.total_bytes == sum(nbytes for _, nbytes in cache._entries.values())
+        assert cache.total_bytes <= cache.max_bytes
+
+
+def test_oversized_values_are_returned_but_not_stored():
+    cache = ByteLRUCache(max_bytes=10)
+    assert cache.put('big', 'value', nbytes=11) == 'value'
+    assert 'big' not in cache and cache.total_bytes == 0
+
+
+def test_get_or_compute_computes_once():
+    cache = ByteLRUCache(max_bytes=1 << 20)
+    calls = []
+    compute = lambda: calls.append(1) or np.zeros(10)
+    first = cache.get_or_compute('key', compute)
+    assert cache.get_or_compute('key', compute) is first
+    assert len(calls) == 1
+    assert cache.total_bytes == first.nbytes
+
+
+def test_estimate_nbytes_counts_nested_frames():
+    frame = pd.DataFrame({'x': np.zeros(1000)})
+    report = {'frame': frame, 'parts': [frame, np.zeros(500)]}
+    assert estimate_nbytes(report) >= 2 * frame.memory_usage(deep=True).sum() + 500 * 8
+
+
+def test_content_hash_is_source_independent(tmp_path):
+    data = b'{"log": {"entries": []}}'
+    path = tmp_path / 'capture.har'
+    path.write_bytes(data)
+    assert content_hash(str(path)) == content_hash(io.BytesIO(data)) == content_hash(io.StringIO(data.decode()))
@@ -0,0 +1,43 @@
+import io
+import os
+
+import pytest
+
+streamlit = pytest.importorskip('streamlit')
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MOCK_HAR = os.path.join(ROOT, 'mock_all_rules_domains.har')
+
+
+@pytest.fixture
+def app(monkeypatch):
+    with open(MOCK_HAR, 'rb') as file:
+        raw = file.read()
+
+    def uploader(label, type=None, **kwargs):
+        if 'HAR' not in label:
+            return None
+        upload = io.BytesIO(raw)
+        upload.name = 'mock.har'
+        return upload
+
+    monkeypatch.setattr(streamlit, 'file_uploader', uploader)
+    monkeypatch.delenv('HAR_ANALYZER_DEBUG', raising=False)
+    app = AppTest.from_file(os.path.join(ROOT, 'dashboard.py'), default_timeout=120)
+    app.run()
+    assert not app.exception
+    return app
+
+
+@pytest.mark.parametrize('rule_id, text', [
+    ('Large Payload', 'Large Payload: 1.19 MB'),
+    ('High Connect Time', 'Connect Time High: 600 ms'),
+    ('High DNS Time', 'DNS Lookup Slow: 400 ms'),
+])
+def test_rule_messages_use_the_rule_field(app, rule_id, text):
+    inspect = next(box for box in app.selectbox if box.label == 'Inspect rule')
+    inspect.set_value(rule_id).run()
+    assert not app.exception
+    messages = app.dataframe[-1].value['message'].tolist()
+    assert any(text in message for message in messages)
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_index import FilterIndex
+
+
+def _frame(n, seed):
+    rng = np.random.default_rng(seed)
+    time_ms = rng.gamma(2.0, 100.0, n)
+    time_ms[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({
+        'status_category': pd.Categorical(rng.choice(['2xx', '3xx', '4xx', '5xx'], n, p=[0.7, 0.1, 0.15, 0.05])),
+        'mime_group': pd.Categorical(rng.choice(['json', 'script', 'image', 'other'], n)),
+        'domain': rng.choice([f"host{i}.example.com" for i in range(12)], n),
+        'method': pd.Categorical(rng.choice(['GET', 'POST', 'PUT'], n, p=[0.7, 0.25, 0.05])),
+        'time_ms': time_ms,
+        'wait_time': rng.gamma(2.0, 40.0, n),
+    })
+
+
+def _random_filters(index, rng):
+    values = {}
+    for column in ['status_category', 'mime_group', 'domain', 'method']:
+        if rng.random() < 0.6:
+            options = index.options(column)
+            values[column] = list(rng.choice(options, rng.integers(0, len(options) + 1), replace=False))
+    ranges = {}
+    if rng.random() < 0.5:
+        low, high = sorted(rng.uniform(0, 600, 2))
+        ranges['time_ms'] = (low if rng.random() < 0.8 else None, high if rng.random() < 0.8 else None)
+    if rng.random() < 0.3:
+        ranges['wait_time'] = (float(rng.uniform(0, 200)), None)
+    return values, ranges
+
+
+def _expected_mask(df, values, ranges):
+    mask = np.ones(len(df), dtype=bool)
+    for column, allowed in values.items():
+        mask &= df[column].isin(allowed).to_numpy()
+    for column, (low, high) in ranges.items():
+        if low is None and high is None:
+            continue
+        mask &= df[column].between(-np.inf if low is None else low, np.inf if high is None else high).to_numpy()
+    return mask
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_select_matches_pandas(seed):
+    # Sizes that are not a multiple of 8 exercise the packed bitmap padding
+    df = _frame(1003 + seed, seed)
+    index = FilterIndex(df)
+    rng = np.random.default_rng(seed)
+    for _ in range(40):
+        values, ranges = _random_filters(index, rng)
+        bits = index.select(values, ranges)
+        expected = _expected_mask(df, values, ranges)
+
+        np.testing.assert_array_equal(index.mask(bits), expected)
+        assert index.count(bits) == expected.sum()
+        positions = index.positions(bits)
+        np.testing.assert_array_equal(np.arange(len(df)) if positions is None else positions,
+                                      np.flatnonzero(expected))
+
+        selected = df[expected]
+        counts = index.counts('method', bits)
+        expected_counts = selected['method'].value_counts()
+        assert {key: count for key, count in counts.items() if count} == \
+            {str(key): count for key, count in expected_counts.items() if count}
+
+        totals = index.totals('domain', df['wait_time'], bits)
+        expected_totals = selected.groupby('domain')['wait_time'].sum()
+        pd.testing.assert_series_equal(totals.sort_index(), expected_totals.sort_index(),
+                                       check_names=False, check_dtype=False, check_index_type=False)
+
+        largest = index.largest('time_ms', 10, bits)
+        np.testing.assert_allclose(np.sort(df['time_ms'].to_numpy()[largest])[::-1],
+                                   selected['time_ms'].nlargest(10).to_numpy())
+
+
+def test_unfiltered_selection_is_none():
+    df = _frame(100, 0)
+    index = FilterIndex(df)
+    everything = {column: index.options(column) for column in ['status_category', 'domain', 'method']}
+    assert index.select(everything, {'time_ms': (None, None)}) is None
+    assert index.count(None) == len(df)
+    assert index.nbytes > 0
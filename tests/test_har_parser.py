@@ -0,0 +1,68 @@
+import codecs
+import io
+import json
+
+import pytest
+
+from har_generator import generate_har
+from har_parser import _EntryStream, build_request_table, extract_request, iter_har_entries
+
+
+def _document():
+    har = generate_har(25, seed=3)
+    # Strings that look like structure, escapes and non-ASCII text must survive chunk boundaries
+    har['log']['entries'][0]['comment'] = 'braces } ] { [ , "quoted" \\ back\\slash'
+    har['log']['entries'][1]['request']['url'] += '?q=naïve-日本語-😀'
+    har['log']['comment'] = {'after': ['entries', {'nested': None}]}
+    return har
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 16])
+def test_entry_stream_matches_json_load(chunk_size):
+    har = _document()
+    for text in (json.dumps(har), json.dumps(har, indent=2, ensure_ascii=False)):
+        entries = list(_EntryStream(io.StringIO(text), chunk_size=chunk_size).entries())
+        assert entries == har['log']['entries']
+
+
+@pytest.mark.parametrize('encoding, bom', [
+    ('utf-8', codecs.BOM_UTF8),
+    ('utf-16-le', codecs.BOM_UTF16_LE),
+    ('utf-16-be', codecs.BOM_UTF16_BE),
+    ('utf-32-le', codecs.BOM_UTF32_LE),
+])
+def test_iter_har_entries_accepts_bom(tmp_path, encoding, bom):
+    har = _document()
+    raw = bom + json.dumps(har, ensure_ascii=False).encode(encoding)
+    path = tmp_path / 'capture.har'
+    path.write_bytes(raw)
+
+    assert list(iter_har_entries(str(path))) == har['log']['entries']
+    assert list(iter_har_entries(io.BytesIO(raw))) == har['log']['entries']
+
+
+def test_iter_har_entries_accepts_bom_in_text():
+    har = _document()
+    assert list(iter_har_entries(io.StringIO('\ufeff' + json.dumps(har)))) == har['log']['entries']
+
+
+def _null_entry():
+    return {
+        'startedDateTime': None, 'time': None, 'serverIPAddress': None, 'connection': 42, '_priority': None,
+        'request': {'method': None, 'url': None, 'headers': None},
+        'response': {'status': None, 'bodySize': None, 'headers': None, 'redirectURL': None,
+                     'content': {'mimeType': None, 'size': None}},
+        'timings': None,
+        'cache': None,
+    }
+
+
+def test_extract_request_matches_table_row():
+    entries = _document()['log']['entries'] + [_null_entry(), {}]
+    df, headers = build_request_table(entries)
+    for row, entry in enumerate(entries):
+        record = extract_request(entry)
+        for column in df.columns:
+            if column in record:
+                assert record[column] == df.at[row, column], (row, column)
+        assert record['request_headers'] == headers[row]
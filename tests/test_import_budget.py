@@ -0,0 +1,6 @@
+from benchmark import check_forbidden_imports
+
+
+def test_core_modules_do_not_import_ui_dependencies():
+    # Import times are checked by `python benchmark.py --check-imports`; wall-clock budgets are too noisy for CI
+    assert check_forbidden_imports() == []
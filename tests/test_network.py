@@ -0,0 +1,79 @@
+import os
+from urllib.parse import urljoin
+
+import numpy as np
+import pytest
+
+from har_generator import generate_har
+from har_parser import build_request_table, load_har_file
+from network import REDIRECT_STATUSES, _start_order, connection_setups, next_hops
+
+MOCK_HAR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mock_all_rules_domains.har')
+
+CAPTURES = {
+    'mock_all_rules_domains': lambda: load_har_file(MOCK_HAR)['log']['entries'],
+    'generated': lambda: generate_har(800, seed=11)['log']['entries'],
+}
+
+
+def _table(name):
+    df, _ = build_request_table(CAPTURES[name](), keep_headers=False)
+    return df
+
+
+def _naive_next_hops(df):
+    """Brute force: for each redirect, the first later-started request to its resolved Location."""
+    rank = np.empty(len(df), dtype='int64')
+    rank[_start_order(df)] = np.arange(len(df))
+    urls = df['url'].astype(str).tolist()
+    hops = np.full(len(df), -1)
+    for i, (status, target) in enumerate(zip(df['status'], df['redirect_url'].astype(str))):
+        if status not in REDIRECT_STATUSES or not target:
+            continue
+        resolved = urljoin(urls[i], target)
+        later = [j for j in range(len(df)) if urls[j] == resolved and rank[j] > rank[i]]
+        if later:
+            hops[i] = min(later, key=lambda j: rank[j])
+    return hops
+
+
+def _naive_setups(df):
+    """Brute force: per request, compare against every request to the same host that came before it."""
+    setups = connection_setups(df)
+    hosts = setups['host'].tolist()
+    start = df['start_ms'].to_numpy(dtype='float64')
+    start = np.nan_to_num(start - np.nanmin(start))
+    end = start + np.clip(np.nan_to_num(df['time_ms'].to_numpy(dtype='float64')), 0, None)
+    connect = np.clip(np.nan_to_num(df['connect_time'].to_numpy(dtype='float64')), 0, None)
+    ssl = np.clip(np.nan_to_num(df['ssl_time'].to_numpy(dtype='float64')), 0, None)
+    connections = df['connection'].astype(str).tolist()
+
+    missed, redundant = [], []
+    for i in range(len(df)):
+        same_host = [j for j in range(len(df)) if hosts[j] == hosts[i]]
+        before = [j for j in same_host if (start[j], j) < (start[i], i)]
+        in_flight = len(before) - sum(end[j] <= start[i] for j in same_host)
+        opened = sum(connect[j] > 0 for j in before)
+        missed.append(connect[i] > 0 and in_flight < opened)
+        redundant.append(connections[i] != '' and ssl[i] > 0 and
+                         any(connections[j] == connections[i] for j in before))
+    return setups, np.array(missed), np.array(redundant)
+
+
+@pytest.mark.parametrize('name', list(CAPTURES))
+def test_next_hops_matches_brute_force(name):
+    df = _table(name)
+    hops = next_hops(df)
+    np.testing.assert_array_equal(hops, _naive_next_hops(df))
+    if name == 'generated':
+        assert (hops >= 0).sum() > 0
+
+
+@pytest.mark.parametrize('name', list(CAPTURES))
+def test_connection_setups_match_brute_force(name):
+    df = _table(name)
+    setups, missed, redundant = _naive_setups(df)
+    np.testing.assert_array_equal(setups['missed_reuse'].to_numpy(), missed)
+    np.testing.assert_array_equal(setups['redundant_tls'].to_numpy(), redundant)
+    if name == 'generated':
+        assert missed.any() and redundant.any()
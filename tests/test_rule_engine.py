@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from har_generator import generate_har
+from har_parser import build_request_table, extract_requests, load_har_file
+from rule_engine import analyze_request, analyze_table, default_plan, rule_issue
+
+MOCK_HAR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mock_all_rules_domains.har')
+
+CAPTURES = {
+    'mock_all_rules_domains': lambda: load_har_file(MOCK_HAR),
+    'generated': lambda: generate_har(2000, seed=7),
+}
+
+
+@pytest.mark.parametrize('name', list(CAPTURES))
+def test_analyze_table_matches_analyze_request(name):
+    har = CAPTURES[name]()
+    plan = default_plan()
+    requests = extract_requests(har)
+    df, _ = build_request_table(har['log']['entries'], keep_headers=False)
+    assert len(df) == len(requests)
+
+    expected = [(row, issue) for row, request in enumerate(requests) for issue in analyze_request(request, plan)]
+    hits = analyze_table(df, plan)
+    actual = [(int(row), rule_issue(rule_id, df.loc[row].to_dict(), plan))
+              for row, rule_id in zip(hits['request_index'], hits['rule_id'].astype(str))]
+
+    assert expected
+    assert actual == expected
+
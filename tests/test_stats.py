@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from stats import DDSketch
+
+
+@pytest.mark.parametrize('relative_accuracy', [0.01, 0.05])
+def test_merged_quantiles_within_relative_error(relative_accuracy):
+    rng = np.random.default_rng(0)
+    # Timings span several orders of magnitude, with some zeros and missing values
+    parts = [rng.lognormal(4, 1.5, 5000), rng.gamma(2.0, 300.0, 3000), np.zeros(200), rng.lognormal(7, 0.5, 800)]
+    merged = DDSketch(relative_accuracy)
+    for part in parts:
+        merged.merge(DDSketch(relative_accuracy).add(np.append(part, np.nan)))
+
+    values = np.sort(np.concatenate(parts))
+    qs = [0.0, 0.01, 0.25, 0.5, 0.9, 0.95, 0.99, 0.999, 1.0]
+    for q, estimate in zip(qs, merged.quantiles(qs)):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(estimate - exact) <= relative_accuracy * exact + 1e-9, (q, estimate, exact)
+
+    assert merged.count == len(values)
+    assert merged.min == values[0] and merged.max == values[-1]
+
+
+def test_merge_equals_single_sketch():
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(5, 1, 4000)
+    whole = DDSketch().add(values)
+    merged = DDSketch()
+    for part in np.array_split(values, 7):
+        merged.merge(DDSketch().add(part))
+    assert merged.bins == whole.bins
+    assert merged.quantiles([0.5, 0.99]) == whole.quantiles([0.5, 0.99])
+    assert DDSketch.from_dict(merged.to_dict()).quantiles([0.5, 0.99]) == whole.quantiles([0.5, 0.99])
+
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        DDSketch(0.01).merge(DDSketch(0.02))
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from har_generator import generate_har
+from har_parser import build_request_table
+from network import build_network_report
+from rule_engine import analyze_table, default_plan
+from store import CaptureStore
+from timeline import build_timeline
+
+
+@pytest.fixture
+def capture():
+    df, headers = build_request_table(generate_har(500, seed=5)['log']['entries'])
+    return df, headers, analyze_table(df)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CaptureStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_save_open_round_trip(store, capture):
+    df, headers, hits = capture
+    store.save('abc123', df, headers, hits, name='capture.har')
+
+    opened, stored_headers = store.open('abc123')
+    pd.testing.assert_frame_equal(opened.reset_index(drop=True), df.reset_index(drop=True), check_categorical=False)
+    assert len(stored_headers) == len(headers)
+    for row in range(len(headers)):
+        assert [(pair['name'], pair['value']) for pair in stored_headers[row]] == list(headers.pairs(row))
+
+    stored_hits = store.hits('abc123')
+    np.testing.assert_array_equal(stored_hits['request_index'], hits['request_index'])
+    assert stored_hits['rule_id'].tolist() == hits['rule_id'].astype(str).tolist()
+
+    captures = store.captures()
+    assert captures['capture_id'].tolist() == ['abc123']
+    assert captures['requests'][0] == len(df) and captures['hits'][0] == len(hits)
+    assert captures['rules_fingerprint'][0] == default_plan().fingerprint
+
+
+def test_open_maps_columns_without_copying(store, capture):
+    pa = pytest.importorskip('pyarrow')
+    df, headers, hits = capture
+    store.save('abc123', df, headers, hits)
+
+    before = pa.total_allocated_bytes()
+    opened, _ = store.open('abc123')
+    assert pa.total_allocated_bytes() == before
+    # Views of the mapped file are read-only; a heap copy would be writeable
+    assert not opened['time_ms'].to_numpy().flags.writeable
+    assert not opened['url'].cat.codes.to_numpy().flags.writeable
+
+    # The read-only table still goes through every analysis
+    pd.testing.assert_frame_equal(analyze_table(opened), hits)
+    assert build_timeline(opened)['critical_path_ms'] == build_timeline(df)['critical_path_ms']
+    assert build_network_report(opened)['redirect_wasted_ms'] == build_network_report(df)['redirect_wasted_ms']
+
+
+def test_percentile_matches_numpy(store, capture):
+    df, headers, hits = capture
+    store.save('abc123', df, headers, hits)
+    store.save('def456', df.iloc[:100], headers, hits[hits['request_index'] < 100])
+
+    values = np.concatenate([df['wait_time'].to_numpy(), df['wait_time'].to_numpy()[:100]])
+    assert store.percentile('wait_time', 95) == pytest.approx(np.percentile(values[values >= 0], 95))
+    # last=1 is the second, smaller capture
+    recent = df.iloc[:100]
+    domain = recent['domain'].astype(str).iloc[0]
+    expected = recent.loc[recent['domain'].astype(str) == domain, 'wait_time'].to_numpy()
+    assert store.percentile('wait_time', 50, domain=domain, last=1) == \
+        pytest.approx(np.percentile(expected[expected >= 0], 50))
+
+
+def test_save_replaces_and_delete_removes(store, capture):
+    df, headers, hits = capture
+    store.save('abc123', df, headers, hits)
+    store.save('abc123', df, headers, hits)
+    assert len(store.captures()) == 1
+    assert len(store.query_requests(columns=['request_index'])) == len(df)
+
+    store.delete('abc123')
+    assert 'abc123' not in store
+    assert store.query_requests(columns=['request_index']).empty
+    with pytest.raises(ValueError):
+        store.open('abc123')
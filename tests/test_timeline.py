@@ -0,0 +1,43 @@
+import numpy as np
+
+from har_generator import generate_har
+from har_parser import build_request_table
+from timeline import build_timeline, link_parents, request_intervals
+
+
+def _table(n_entries, seed):
+    df, _ = build_request_table(generate_har(n_entries, seed=seed)['log']['entries'], keep_headers=False)
+    return df
+
+
+def _naive_parents(df, intervals):
+    """Brute force: the latest earlier-started request whose URL is the initiator, else the referer."""
+    rows = df.loc[intervals.index]
+    urls = rows['url'].astype(str).tolist()
+    parents = []
+    for position, (initiator, referer) in enumerate(zip(rows['initiator'].astype(str), rows['referer'].astype(str))):
+        target = initiator or referer
+        earlier = [i for i in range(position) if urls[i] == target]
+        parents.append(intervals.index[earlier[-1]] if target and earlier else -1)
+    return np.array(parents)
+
+
+def test_link_parents_matches_brute_force():
+    df = _table(600, seed=3)
+    intervals = request_intervals(df)
+    parents = link_parents(df, intervals)
+    assert (parents >= 0).mean() > 0.9
+    np.testing.assert_array_equal(parents.to_numpy(), _naive_parents(df, intervals))
+
+
+def test_generated_capture_has_multi_hop_critical_path():
+    df = _table(2000, seed=7)
+    path = build_timeline(df)['critical_path']
+    assert len(path) >= 3
+
+    # Each hop is triggered by the one before it, and the chain starts at a page load
+    rows = path['request_index'].tolist()
+    assert df.at[rows[0], 'initiator'] == '' and df.at[rows[0], 'referer'] == ''
+    for parent, child in zip(rows, rows[1:]):
+        assert str(df.at[child, 'initiator'] or df.at[child, 'referer']) == str(df.at[parent, 'url'])
+        assert df.at[parent, 'start_ms'] < df.at[child, 'start_ms']
@@ -0,0 +1,162 @@
+"""
+Waterfall analysis over the request table: request lifetimes, concurrency over
+time, idle gaps and the critical path through the initiator/referer chain.
+
+Everything is built from sorted arrays (O(n log n)) so it stays interactive on
+captures with 100k+ entries.
+"""
+import numpy as np
+import pandas as pd
+
+from har_parser import parse_start_times
+from url_index import UrlRankIndex
+
+
+def request_intervals(df):
+    """
+    Lifetime of every request with a parseable start time, as milliseconds
+    since the first request started. Sorted by start; indexed like `df`.
+    """
+    start = df['start_ms'].to_numpy() if 'start_ms' in df.columns else parse_start_times(df['start_time'])
+    duration = np.clip(np.nan_to_num(df['time_ms'].to_numpy(dtype='float64'), nan=0.0), 0, None)
+    valid = ~np.isnan(start)
+    if not valid.any():
+        return pd.DataFrame({'start_ms': [], 'end_ms': []}, index=df.index[:0])
+
+    origin = start[valid].min()
+    intervals = pd.DataFrame({
+        'start_ms': start[valid] - origin,
+        'end_ms': start[valid] - origin + duration[valid],
+    }, index=df.index[valid])
+    intervals.attrs['origin_ms'] = origin
+    return intervals.sort_values('start_ms', kind='stable')
+
+
+def requests_active_at(intervals, t_ms):
+    """Index labels of the requests in flight at `t_ms` (relative to the capture start)."""
+    starts = intervals['start_ms'].to_numpy()
+    candidates = intervals.iloc[:np.searchsorted(starts, t_ms, side='right')]
+    return candidates.index[candidates['end_ms'].to_numpy() > t_ms]
+
+
+def concurrency_profile(intervals):
+    """
+    Step function of in-flight requests: each row is a time at which the count
+    changes and the count from then on. Requests ending exactly when another
+    starts are not counted as overlapping.
+    """
+    if intervals.empty:
+        return pd.DataFrame({'t_ms': [], 'active': []})
+    times = np.concatenate([intervals['start_ms'].to_numpy(), intervals['end_ms'].to_numpy()])
+    deltas = np.concatenate([np.ones(len(intervals), dtype='int64'), -np.ones(len(intervals), dtype='int64')])
+    order = np.lexsort((deltas, times))
+    times, active = times[order], np.cumsum(deltas[order])
+
+    # Keep only the last value at each timestamp
+    last = np.append(times[1:] != times[:-1], True)
+    return pd.DataFrame({'t_ms': times[last], 'active': active[last]})
+
+
+def bucket_concurrency(profile, bucket_ms):
+    """Peak concurrency per fixed-width bucket, for plotting long captures."""
+    if profile.empty:
+        return pd.DataFrame({'t_ms': [], 'active': []})
+    times = profile['t_ms'].to_numpy()
+    active = profile['active'].to_numpy()
+    buckets = (times // bucket_ms).astype('int64')
+    starts = np.flatnonzero(np.append(True, buckets[1:] != buckets[:-1]))
+    peak = np.maximum.reduceat(active, starts)
+    # A bucket also sees the level carried over from the previous change
+    carried = np.append(0, active[starts[1:] - 1])
+    return pd.DataFrame({'t_ms': buckets[starts] * bucket_ms, 'active': np.maximum(peak, carried)})
+
+
+def idle_gaps(intervals, min_gap_ms=0.0):
+    """Periods where no request was in flight, longer than `min_gap_ms`."""
+    starts = intervals['start_ms'].to_numpy()
+    ends = intervals['end_ms'].to_numpy()
+    if len(starts) < 2:
+        return pd.DataFrame({'start_ms': [], 'end_ms': [], 'gap_ms': []})
+
+    # Intervals are sorted by start; the running max end is when everything so far finished
+    covered_until = np.maximum.accumulate(ends)[:-1]
+    gap = starts[1:] - covered_until
+    mask = gap > min_gap_ms
+    return pd.DataFrame({'start_ms': covered_until[mask], 'end_ms': starts[1:][mask], 'gap_ms': gap[mask]})
+
+
+def link_parents(df, intervals):
+    """
+    For every request in `intervals`, the index label of the request that
+    triggered it (or -1): the latest earlier-started request whose URL equals
+    the child's initiator, falling back to its referer. Lookups go through a
+    (url, start rank) sorted index, so linking is O(n log n).
+    """
+    n = len(intervals)
+    rows = df.loc[intervals.index]
+    urls = rows['url'].astype(str).to_numpy(dtype=object)
+    parent_urls = rows['referer'].astype(str).to_numpy(dtype=object) if 'referer' in rows.columns \
+        else np.full(n, '', dtype=object)
+    if 'initiator' in rows.columns:
+        initiators = rows['initiator'].astype(str).to_numpy(dtype=object)
+        parent_urls = np.where(initiators != '', initiators, parent_urls)
+
+    # Intervals are already in start order, so position == start rank
+    rank = np.arange(n, dtype='int64')
+    # Last request with the parent's URL that started strictly before the child
+    parents = UrlRankIndex(urls, rank).last_before(parent_urls, rank)
+
+    labels = intervals.index.to_numpy()
+    return pd.Series(np.where(parents >= 0, labels[parents], -1), index=intervals.index, name='parent')
+
+
+def critical_path(df, intervals=None, parents=None):
+    """
+    The dependency chain ending at the last request to finish, walked back
+    through `link_parents`. `gap_before_ms` is how long each request started
+    after its parent finished (negative when it started while the parent was
+    still in flight).
+    """
+    intervals = request_intervals(df) if intervals is None else intervals
+    columns = ['request_index', 'url', 'start_ms', 'end_ms', 'time_ms', 'gap_before_ms']
+    if intervals.empty:
+        return pd.DataFrame(columns=columns)
+    parents = link_parents(df, intervals) if parents is None else parents
+
+    chain = []
+    current = intervals['end_ms'].idxmax()
+    while current != -1:
+        chain.append(current)
+        # Parents always started strictly earlier, so the walk terminates
+        current = parents.at[current]
+    chain.reverse()
+
+    path = intervals.loc[chain]
+    parent_ends = path['end_ms'].shift(1)
+    return pd.DataFrame({
+        'request_index': chain,
+        'url': df.loc[chain, 'url'].astype(str).to_numpy(),
+        'start_ms': path['start_ms'].to_numpy(),
+        'end_ms': path['end_ms'].to_numpy(),
+        'time_ms': df.loc[chain, 'time_ms'].to_numpy(),
+        'gap_before_ms': (path['start_ms'] - parent_ends).to_numpy(),
+    })
+
+
+def build_timeline(df, min_gap_ms=0.0):
+    """Computes intervals, concurrency, idle gaps and the critical path in one go."""
+    intervals = request_intervals(df)
+    profile = concurrency_profile(intervals)
+    gaps = idle_gaps(intervals, min_gap_ms)
+    path = critical_path(df, intervals)
+    span = float(intervals['end_ms'].max()) if len(intervals) else 0.0
+    return {
+        'intervals': intervals,
+        'concurrency': profile,
+        'idle_gaps': gaps,
+        'critical_path': path,
+        'span_ms': span,
+        'max_concurrency': int(profile['active'].max()) if len(profile) else 0,
+        'idle_ms': float(gaps['gap_ms'].sum()),
+        'critical_path_ms': float(path['end_ms'].iloc[-1] - path['start_ms'].iloc[0]) if len(path) else 0.0,
+    }
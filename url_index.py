@@ -0,0 +1,43 @@
+"""
+Sorted (url, rank) index over a request table, for "the previous / next
+request to this URL" lookups. Redirect hops (`network.next_hops`) and
+initiator links (`timeline.link_parents`) both reduce to these.
+
+Each row's key packs its URL code and its rank (its position in some order,
+e.g. by start time) into one int64, `code * n + rank`. Sorting the keys once
+turns every lookup into a single `searchsorted`, so a batch of n lookups is
+O(n log n).
+"""
+import numpy as np
+import pandas as pd
+
+
+class UrlRankIndex:
+    """Rows keyed by (URL, rank); `rank` must be a permutation of 0..n-1."""
+
+    def __init__(self, urls, rank):
+        self.size = len(urls)
+        self.urls = pd.Index(pd.unique(urls))
+        self.codes = self.urls.get_indexer(urls).astype('int64')
+        keys = self.codes * self.size + np.asarray(rank, dtype='int64')
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def _lookup(self, urls, rank, side, step):
+        codes = self.urls.get_indexer(urls).astype('int64')
+        found = np.searchsorted(self.sorted_keys, codes * self.size + np.asarray(rank, dtype='int64'),
+                                side=side) + step
+        inside = (found >= 0) & (found < self.size)
+        candidates = self.order[np.clip(found, 0, max(self.size - 1, 0))] if self.size \
+            else np.zeros(len(codes), dtype='int64')
+        valid = (codes >= 0) & inside
+        valid[valid] = self.codes[candidates[valid]] == codes[valid]
+        return np.where(valid, candidates, -1)
+
+    def last_before(self, urls, rank):
+        """For each (url, rank) pair, the row with that URL and the highest rank below `rank`, or -1."""
+        return self._lookup(urls, rank, 'left', -1)
+
+    def first_after(self, urls, rank):
+        """For each (url, rank) pair, the row with that URL and the lowest rank above `rank`, or -1."""
+        return self._lookup(urls, rank, 'right', 0)
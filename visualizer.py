@@ -1,26 +1,104 @@
-import plotly.express as px
 import pandas as pd
-import streamlit as st
 
-def plot_top_slowest_requests(df, top_n=10, return_fig=False):
-    df = df.copy()
-    df['short_url'] = df['url'].apply(lambda u: u if len(u) < 80 else u[:77] + '...')
-    df['status_category'] = df['status'].apply(lambda s: f"{s // 100}xx")
+from instrumentation import table_rows, timed
+
+TIMING_PHASES = ['dns_time', 'connect_time', 'ssl_time', 'wait_time', 'receive_time']
+
+
+def _plotly_express():
+    # plotly.express takes ~0.3 s to import; only pay for it when a chart is drawn
+    import plotly.express as px
+    return px
+
+
+def _status_categories(df):
+    if 'status_category' in df.columns:
+        return df['status_category']
+    return (df['status'] // 100).astype(str) + 'xx'
+
+
+def _domains(df):
+    if 'domain' in df.columns:
+        return df['domain']
+    urls = df['url'].astype(str)
+    return urls.str.split('/', n=3).str[2].where(urls.str.contains('//', regex=False), 'unknown')
+
+
+def top_slowest_requests(df, top_n=10, rows=None):
+    """
+    The `top_n` slowest requests, with display columns computed for those rows
+    only. `rows` (their positions, e.g. from `FilterIndex.largest`) skips the search.
+    """
+    top = df.loc[df['time_ms'].nlargest(top_n).index] if rows is None else df.iloc[rows]
+    # Materialize just these N urls; casting a categorical column would convert every category
+    urls = pd.Series(top['url'].to_numpy(dtype=object), index=top.index).astype(str)
+    data = pd.DataFrame({
+        'short_url': urls.where(urls.str.len() < 80, urls.str[:77] + '...'),
+        'status_category': (top['status'] // 100).astype(str) + 'xx',
+    }, index=top.index)
 
     # Ensure all timing fields are present and clean
-    for col in ['dns_time', 'connect_time', 'ssl_time', 'wait_time', 'receive_time']:
-        if col not in df.columns:
-            df[col] = 0
-        df[col] = df[col].replace(-1, 0).fillna(0)
+    for col in TIMING_PHASES:
+        data[col] = top[col].replace(-1, 0).fillna(0) if col in top.columns else 0
+    return data
 
-    # Sort by total time and select top N
-    df = df.sort_values(by='time_ms', ascending=False).head(top_n)
+
+def status_code_counts(df):
+    counts = _status_categories(df).value_counts()
+    count_df = counts[counts > 0].reset_index()
+    count_df.columns = ['status_category', 'count']
+    count_df['status_category'] = count_df['status_category'].astype(str)
+    return count_df
+
+
+def domain_load_times(df, top=10, totals=None):
+    """
+    Total load time per domain, largest `top` domains first. `totals` (domain ->
+    total ms, e.g. `FilterIndex.totals`) is used instead of grouping `df` when given.
+    """
+    if totals is None:
+        totals = df['time_ms'].groupby(_domains(df), observed=True).sum()
+    domain_df = totals.nlargest(top).reset_index()
+    domain_df.columns = ['domain', 'time_ms']
+    domain_df['domain'] = domain_df['domain'].astype(str)
+    return domain_df
+
+
+@timed('charts.build_chart_data', entries=table_rows)
+def build_chart_data(df, top_n=10, status_counts=None, slowest_rows=None, domain_totals=None):
+    """
+    Computes every chart's aggregate once for a (filtered) request table so the
+    plot functions can share them instead of each re-scanning the rows.
+    Precomputed inputs, e.g. from a `FilterIndex` over the unfiltered table, are
+    used as is when given: `status_counts` (status category -> rows),
+    `slowest_rows` (positions of the slowest rows) and `domain_totals`
+    (domain -> total ms).
+    """
+    if status_counts is not None:
+        status_counts = status_counts[status_counts > 0].sort_values(ascending=False, kind='stable')
+        status_counts = pd.DataFrame({'status_category': status_counts.index.astype(str),
+                                      'count': status_counts.to_numpy()})
+    return {
+        'top_n': top_n,
+        'slowest': top_slowest_requests(df, top_n, rows=slowest_rows),
+        'status_counts': status_code_counts(df) if status_counts is None else status_counts,
+        'domain_totals': domain_load_times(df, totals=domain_totals),
+    }
+
+
+@timed('charts.plot_top_slowest_requests', entries=table_rows)
+def plot_top_slowest_requests(df, top_n=10, return_fig=False, chart_data=None):
+    px = _plotly_express()
+    if chart_data is not None:
+        df, top_n = chart_data['slowest'], chart_data['top_n']
+    else:
+        df = top_slowest_requests(df, top_n)
 
     # Plot horizontal stacked bar chart
     fig = px.bar(
         df,
         y='short_url',
-        x=['dns_time', 'connect_time', 'ssl_time', 'wait_time', 'receive_time'],
+        x=TIMING_PHASES,
         orientation='h',
         labels={
             'short_url': 'Request URL',
@@ -43,10 +121,10 @@ def plot_top_slowest_requests(df, top_n=10, return_fig=False):
         return fig
     fig.show()
 
-def plot_status_code_distribution(df, return_fig=False):
-    df['status_category'] = df['status'].apply(lambda s: f"{s // 100}xx")
-    count_df = df['status_category'].value_counts().reset_index()
-    count_df.columns = ['status_category', 'count']
+@timed('charts.plot_status_code_distribution', entries=table_rows)
+def plot_status_code_distribution(df, return_fig=False, chart_data=None):
+    px = _plotly_express()
+    count_df = chart_data['status_counts'] if chart_data is not None else status_code_counts(df)
     fig = px.pie(count_df, names='status_category', values='count',
                  title='HTTP Status Code Distribution',
                  hole=0.4,
@@ -57,17 +135,11 @@ def plot_status_code_distribution(df, return_fig=False):
     fig.show()
 
 
-def plot_domain_load_time(df, return_fig=False):
-    df = df.copy()
-
-    # Extract domain from URL
-    df['domain'] = df['url'].apply(lambda u: u.split('/')[2] if '//' in u else 'unknown')
-
-    # Group by domain and sum total load time
-    domain_df = df.groupby('domain')['time_ms'].sum().reset_index()
-
-    # Sort and take top 10
-    domain_df = domain_df.sort_values(by='time_ms', ascending=False).head(10)
+@timed('charts.plot_domain_load_time', entries=table_rows)
+def plot_domain_load_time(df, return_fig=False, chart_data=None):
+    px = _plotly_express()
+    # Total load time of the top 10 domains
+    domain_df = chart_data['domain_totals'] if chart_data is not None else domain_load_times(df)
 
     # Create bar chart
     fig = px.bar(
@@ -86,3 +158,52 @@ def plot_domain_load_time(df, return_fig=False):
         return fig
     fig.show()
 
+
+@timed('charts.plot_latency_percentiles', entries=table_rows)
+def plot_latency_percentiles(stats, top=10, return_fig=False):
+    px = _plotly_express()
+    # p50/p90/p99 per group from `stats.group_stats`, slowest tail first
+    top_df = stats.head(top).melt(
+        id_vars='key',
+        value_vars=['p50_time_ms', 'p90_time_ms', 'p99_time_ms'],
+        var_name='percentile',
+        value_name='time_ms',
+    )
+    top_df['percentile'] = top_df['percentile'].str.replace('_time_ms', '', regex=False)
+
+    fig = px.bar(
+        top_df,
+        x='key',
+        y='time_ms',
+        color='percentile',
+        barmode='group',
+        title='Latency Percentiles (slowest p99 first)',
+        labels={'key': '', 'time_ms': 'Time (ms)', 'percentile': 'Percentile'},
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+    fig.update_layout(height=400)
+
+    if return_fig:
+        return fig
+    fig.show()
+
+
+@timed('charts.plot_concurrency', entries=table_rows)
+def plot_concurrency(profile, return_fig=False):
+    px = _plotly_express()
+    # Step line of in-flight requests over the capture
+    fig = px.line(
+        profile,
+        x='t_ms',
+        y='active',
+        line_shape='hv',
+        title='Concurrent Requests Over Time',
+        labels={'t_ms': 'Time since first request (ms)', 'active': 'In-flight requests'},
+    )
+
+    fig.update_layout(height=350)
+
+    if return_fig:
+        return fig
+    fig.show()